@@ -9,11 +9,14 @@
 import sys
 import os
 
-# 添加项目根目录到路径，以便导入模块
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# 添加项目根目录到路径，以便导入模块（已存在时不重复添加）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
 
 from pinyin_regex import (
     pinyin_regex_match,
+    pinyin_regex_match_many,
     text_to_tokens,
     expand_pinyin,
     get_shengmu,
@@ -21,25 +24,85 @@ from pinyin_regex import (
     FUZZY_MAP,
 )
 
+# 基础拼音匹配示例：(模式, 文本, 说明)
+_BASIC_EXAMPLES = (
+    ("yinyue", "音乐", "全拼匹配"),
+    ("chongqing", "重庆", "全拼匹配"),
+    ("beijing", "北京", "全拼匹配"),
+    ("yy", "音乐", "首字母匹配"),
+    ("cq", "重庆", "首字母匹配"),
+    ("bj", "北京", "首字母匹配"),
+    ("zong", "中", "模糊音匹配 zhong→zong"),
+    ("si", "是", "模糊音匹配 shi→si"),
+    ("ci", "吃", "模糊音匹配 chi→ci"),
+)
+
+# 正则表达式功能示例
+_REGEX_EXAMPLES = (
+    ("yin(yue|le)", "音乐", "或操作"),
+    ("(yin|zhong)", "音乐", "选择匹配"),
+    ("yin.*le", "音乐", "零次或多次重复"),
+    ("y.+e", "音乐", "一次或多次重复"),
+    ("yi?n", "音", "零次或一次重复"),
+    (r"y\w+e", "音乐", "字母字符类"),
+    (r"\z\z", "音乐", "中文token类"),
+    (r"[yl]in", "音", "字符集合"),
+    (r"y[a-z]+e", "音乐", "字符范围"),
+    (r"[^z]hong", "中", "否定字符集合"),
+)
+
+# 范围量词示例
+_RANGE_EXAMPLES = (
+    (r"y{2}", "音乐", "精确重复2次"),
+    (r"y{1,2}", "音乐", "重复1-2次"),
+    (r"y{1,}", "音乐", "至少重复1次"),
+    (r"yin{1,2}", "音乐因", "拼音重复1-2次"),
+    (r"y{0}", "音乐", "空重复（匹配任何文本）"),
+)
+
+# 子串匹配示例
+_SUBSTRING_EXAMPLES = (
+    ("yue", "我的音乐很好听", "在长文本中搜索"),
+    ("yin", "纯音乐欣赏", "子串匹配"),
+    ("beijing", "我爱北京天安门", "城市名子串"),
+    ("yinyue", "背景音乐很重要", "多字子串"),
+)
+
+# 批量匹配示例文本
+_BATCH_TEXTS = ("我的音乐很好听", "纯音乐欣赏", "我爱北京天安门", "背景音乐很重要")
+
+# 多音字示例
+_POLYPHONIC_EXAMPLES = (
+    ("chongqing", "重庆", "重: chong/zhong"),
+    ("zhongqing", "重庆", "重: chong/zhong"),
+    ("changjiang", "长江", "长: chang/zhang"),
+    ("zhangjiang", "长江", "长: chang/zhang"),
+    ("le", "乐", "乐: le/yue"),
+    ("yue", "乐", "乐: le/yue"),
+)
+
+# 复杂正则模式示例
+_COMPLEX_PATTERNS = (
+    (r"(yin|zhong|chang|bei)[a-z]*", "音乐中国长江北京", "多个城市名匹配"),
+    (r"[yz][a-z]+", "音乐因应永", "以y或z开头的拼音"),
+    (r".+ing", "北京南京上海", "以ing结尾的拼音"),
+)
+
+# 配置选项组合：(use_initials, use_fuzzy, 说明)
+_CONFIGS = (
+    (True, True, "启用首字母和模糊音"),
+    (True, False, "启用首字母，禁用模糊音"),
+    (False, True, "禁用首字母，启用模糊音"),
+    (False, False, "禁用首字母和模糊音"),
+)
+
 
 def basic_examples():
     """基础功能示例"""
     print("=== 基础拼音匹配示例 ===")
 
     # 全拼匹配
-    examples = [
-        ("yinyue", "音乐", "全拼匹配"),
-        ("chongqing", "重庆", "全拼匹配"),
-        ("beijing", "北京", "全拼匹配"),
-        ("yy", "音乐", "首字母匹配"),
-        ("cq", "重庆", "首字母匹配"),
-        ("bj", "北京", "首字母匹配"),
-        ("zong", "中", "模糊音匹配 zhong→zong"),
-        ("si", "是", "模糊音匹配 shi→si"),
-        ("ci", "吃", "模糊音匹配 chi→ci"),
-    ]
-
-    for pattern, text, description in examples:
+    for pattern, text, description in _BASIC_EXAMPLES:
         result = pinyin_regex_match(pattern, text)
         print(f"{pattern:12} vs {text:6} -> {result} ({description})")
 
@@ -48,20 +111,7 @@ def regex_examples():
     """正则表达式功能示例"""
     print("\n=== 正则表达式功能示例 ===")
 
-    regex_examples = [
-        ("yin(yue|le)", "音乐", "或操作"),
-        ("(yin|zhong)", "音乐", "选择匹配"),
-        ("yin.*le", "音乐", "零次或多次重复"),
-        ("y.+e", "音乐", "一次或多次重复"),
-        ("yi?n", "音", "零次或一次重复"),
-        (r"y\w+e", "音乐", "字母字符类"),
-        (r"\z\z", "音乐", "中文token类"),
-        (r"[yl]in", "音", "字符集合"),
-        (r"y[a-z]+e", "音乐", "字符范围"),
-        (r"[^z]hong", "中", "否定字符集合"),
-    ]
-
-    for pattern, text, description in regex_examples:
+    for pattern, text, description in _REGEX_EXAMPLES:
         result = pinyin_regex_match(pattern, text)
         print(f"{pattern:15} vs {text:6} -> {result} ({description})")
 
@@ -70,15 +120,7 @@ def range_quantifier_examples():
     """范围量词示例"""
     print("\n=== 范围量词 {m,n} 示例 ===")
 
-    range_examples = [
-        (r"y{2}", "音乐", "精确重复2次"),
-        (r"y{1,2}", "音乐", "重复1-2次"),
-        (r"y{1,}", "音乐", "至少重复1次"),
-        (r"yin{1,2}", "音乐因", "拼音重复1-2次"),
-        (r"y{0}", "音乐", "空重复（匹配任何文本）"),
-    ]
-
-    for pattern, text, description in range_examples:
+    for pattern, text, description in _RANGE_EXAMPLES:
         result = pinyin_regex_match(pattern, text)
         print(f"{pattern:15} vs {text:8} -> {result} ({description})")
 
@@ -87,17 +129,16 @@ def substring_matching_examples():
     """子串匹配示例"""
     print("\n=== 子串匹配示例 ===")
 
-    substring_examples = [
-        ("yue", "我的音乐很好听", "在长文本中搜索"),
-        ("yin", "纯音乐欣赏", "子串匹配"),
-        ("beijing", "我爱北京天安门", "城市名子串"),
-        ("yinyue", "背景音乐很重要", "多字子串"),
-    ]
-
-    for pattern, text, description in substring_examples:
+    for pattern, text, description in _SUBSTRING_EXAMPLES:
         result = pinyin_regex_match(pattern, text)
         print(f"{pattern:12} vs '{text}' -> {result} ({description})")
 
+    # 同一模式批量匹配多个文本，模式只编译一次
+    print("\n批量匹配:")
+    pattern = "yinyue"
+    for text, result in zip(_BATCH_TEXTS, pinyin_regex_match_many(pattern, _BATCH_TEXTS)):
+        print(f"  {pattern:12} vs '{text}' -> {result}")
+
 
 def utility_function_examples():
     """工具函数示例"""
@@ -129,28 +170,13 @@ def advanced_examples():
 
     # 多音字处理
     print("多音字处理:")
-    polyphonic_examples = [
-        ("chongqing", "重庆", "重: chong/zhong"),
-        ("zhongqing", "重庆", "重: chong/zhong"),
-        ("changjiang", "长江", "长: chang/zhang"),
-        ("zhangjiang", "长江", "长: chang/zhang"),
-        ("le", "乐", "乐: le/yue"),
-        ("yue", "乐", "乐: le/yue"),
-    ]
-
-    for pattern, text, description in polyphonic_examples:
+    for pattern, text, description in _POLYPHONIC_EXAMPLES:
         result = pinyin_regex_match(pattern, text)
         print(f"  {pattern:12} vs {text:6} -> {result} ({description})")
 
     # 复杂模式
     print("\n复杂正则模式:")
-    complex_patterns = [
-        (r"(yin|zhong|chang|bei)[a-z]*", "音乐中国长江北京", "多个城市名匹配"),
-        (r"[yz][a-z]+", "音乐因应永", "以y或z开头的拼音"),
-        (r".+ing", "北京南京上海", "以ing结尾的拼音"),
-    ]
-
-    for pattern, text, description in complex_patterns:
+    for pattern, text, description in _COMPLEX_PATTERNS:
         result = pinyin_regex_match(pattern, text)
         print(f"  {pattern:25} vs '{text}' -> {result} ({description})")
 
@@ -163,15 +189,8 @@ def configuration_examples():
     text = "中"
 
     # 不同配置的匹配结果
-    configs = [
-        (True, True, "启用首字母和模糊音"),
-        (True, False, "启用首字母，禁用模糊音"),
-        (False, True, "禁用首字母，启用模糊音"),
-        (False, False, "禁用首字母和模糊音"),
-    ]
-
     print(f"模式: {pattern}, 文本: {text}")
-    for use_initials, use_fuzzy, description in configs:
+    for use_initials, use_fuzzy, description in _CONFIGS:
         result = pinyin_regex_match(pattern, text, use_initials=use_initials, use_fuzzy=use_fuzzy)
         print(f"  {description:25} -> {result}")
 
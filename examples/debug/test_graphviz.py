@@ -7,8 +7,10 @@
 import sys
 import os
 
-# 添加项目根目录到路径以便导入pinyin_regex
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# 添加项目根目录到路径以便导入pinyin_regex（已存在时不重复添加）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
 
 from pinyin_regex.debug import visualize_nfa, render_nfa_graph, GRAPHVIZ_AVAILABLE
 from pinyin_regex import compile_regex
@@ -7,10 +7,12 @@
 import sys
 import os
 
-# 添加项目根目录到路径以便导入pinyin_regex
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# 添加项目根目录到路径以便导入pinyin_regex（已存在时不重复添加）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
 
-from pinyin_regex.debug import PerformanceProfiler
+from pinyin_regex.debug import PerformanceProfiler, count_states
 from pinyin_regex import pinyin_regex_match, compile_regex
 from pinyin_regex.pinyin_utils import text_to_tokens
 
@@ -84,16 +86,22 @@ def benchmark_matching():
     print(f"{'模式':<20} {'文本':<8} {'时间(秒)':<12} {'结果':<6}")
     print("-" * 50)
 
+    # 预先编译，计时只覆盖匹配本身
+    compiled = {p: compile_regex(p.lower()) for p, _ in test_cases}
+
+    rows = []
     for pattern, text in test_cases:
-        duration = profiler.profile_matching(pattern, text)
-        result = pinyin_regex_match(pattern, text)
+        duration = profiler.profile_run(compiled[pattern], text)
+        rows.append((pattern, text, duration, pinyin_regex_match(pattern, text)))
 
+    # 计时结束后再统一格式化输出
+    for pattern, text, duration, result in rows:
         print(f"{pattern:<20} {text:<8} {duration:<12.6f} {result:<6}")
 
     # 匹配性能摘要
     summary = profiler.get_summary()
-    if "matching" in summary:
-        stats = summary["matching"]
+    if "run" in summary:
+        stats = summary["run"]
         print(f"\n匹配性能摘要:")
         print(f"  总测试数: {stats['count']}")
         print(f"  平均时间: {stats['average']:.6f}秒")
@@ -123,14 +131,14 @@ def benchmark_tokenization():
     print("-" * 35)
 
     for text in test_texts:
-        start_time = profiler.perf_counter()
+        start_time = profiler.perf_counter_ns()
         tokens = text_to_tokens(text)
-        end_time = profiler.perf_counter()
+        end_time = profiler.perf_counter_ns()
 
-        duration = end_time - start_time
-        profiler.timings["tokenization"].append(duration)
+        duration_ns = end_time - start_time
+        profiler.timings["tokenization"].append(duration_ns)
 
-        print(f"{len(text):<8} {duration:<12.6f} {len(tokens):<8}")
+        print(f"{len(text):<8} {duration_ns / 1e9:<12.6f} {len(tokens):<8}")
 
     # Token化性能摘要
     summary = profiler.get_summary()
@@ -176,24 +184,6 @@ def memory_usage_analysis():
         print("请使用 'pip install psutil' 安装")
 
 
-def count_states(start_state):
-    """计算NFA状态数"""
-    visited = set()
-    stack = [start_state]
-
-    while stack:
-        s = stack.pop()
-        if s in visited:
-            continue
-        visited.add(s)
-
-        stack.extend(s.eps)
-        for targets in s.trans.values():
-            stack.extend(targets)
-
-    return len(visited)
-
-
 def performance_comparison():
     """性能对比测试"""
     print("\n=== 性能对比测试 ===")
@@ -212,13 +202,17 @@ def performance_comparison():
     ]
 
     print("不同选项的性能对比:")
-    print(f"{'选项':<40} {'时间(秒)':<12}")
-    print("-" * 55)
+    print(f"{'选项':<52} {'时间(秒)':<12}")
+    print("-" * 67)
+
+    start_state = compile_regex(pattern)
+    # 显示用的选项标签在计时循环外预先生成
+    labels = [", ".join(f"{k}={v}" for k, v in options.items()) for options in options_list]
+
+    durations = [profiler.profile_run(start_state, text, **options) for options in options_list]
 
-    for options in options_list:
-        duration = profiler.profile_matching(pattern, text, **options)
-        options_str = str(options).replace("'", "")[1:-1]  # 美化显示
-        print(f"{options_str:<40} {duration:<12.6f}")
+    for label, duration in zip(labels, durations):
+        print(f"{label:<52} {duration:<12.6f}")
 
 
 def main():
@@ -9,9 +9,18 @@ Python库，支持使用拼音正则表达式匹配中文字符。
 __version__ = "1.0.0"
 __author__ = "Pinyin Regex Engine Team"
 
+import re
+import string
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
 # 导入核心功能
 from .pinyin_utils import (
     text_to_tokens,
+    text_to_token_arrays,
+    tokens_to_dicts,
+    Tokens,
+    preload_char_pinyins,
     expand_pinyin,
     get_shengmu,
     INITIALS,
@@ -19,11 +28,13 @@ from .pinyin_utils import (
 )
 from .engine import (
     State,
+    CompiledNFA,
+    LazyDFA,
     run_pinyin_regex,
     epsilon_closure,
     match_label,
 )
-from .parser import compile_regex
+from .parser import compile_regex, compile_pattern, compile_regex_dfa
 from .errors import (
     PinyinRegexError,
     PatternParseError,
@@ -34,6 +45,143 @@ from .errors import (
 )
 
 
+# 编译缓存容量
+COMPILE_CACHE_SIZE = 1024
+
+# token缓存容量
+TOKENS_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile_cached(pattern_lower: str) -> LazyDFA:
+    """带LRU缓存的模式编译
+
+    编译结果只与模式本身有关，与匹配选项无关，因此以小写模式作为缓存键。
+    模式编译为惰性DFA，匹配过程中只会追加转换缓存，可在多次调用间安全复用。
+
+    Args:
+        pattern_lower: 已转为小写的正则表达式模式
+
+    Returns:
+        惰性DFA
+    """
+    return compile_regex_dfa(pattern_lower)
+
+
+# 可交给 re 模块处理的模式字符：字母、数字、选择、分组、点号和基本量词
+_PLAIN_PATTERN_CHARS = frozenset(string.ascii_lowercase + string.digits + "|()*+?.")
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _plain_regex_cached(pattern_lower: str) -> Optional["re.Pattern[str]"]:
+    """把只用到基本语法的模式编译为标准库正则，用于匹配纯ASCII文本
+
+    ASCII字符的拼音集合只有字符本身，按字符分割时在ASCII文本上的拼音正则匹配
+    与 re.search 结果相同，前提是模式只用到两者语义一致的语法。锚点（re 的 $ 还能匹配
+    末尾换行之前）、转义、字符类和 {m,n} 都不在其列。点号在本引擎中也匹配换行，因此使用 re.DOTALL。
+
+    re 是回溯引擎，作用于分组或多处叠加的量词（如 (a|aa)*c、(a*)*b）会退化为指数时间；
+    即便只有一个量词，其后还有模式时（如 .*x），re.search 在每个起点都会扫描到文本末尾，
+    整体为平方时间。本引擎保证线性时间，因此只接受至多一个、直接作用于单个字符或点号、
+    且位于模式末尾的量词：匹配走到量词时必定成功，每个起点的工作量不超过模式长度。
+
+    Args:
+        pattern_lower: 已转为小写的正则表达式模式
+
+    Returns:
+        编译后的标准库正则；模式超出上述语法范围时返回None
+    """
+    prev = "("
+    last = len(pattern_lower) - 1
+    for i, c in enumerate(pattern_lower):
+        if c not in _PLAIN_PATTERN_CHARS:
+            return None
+        if c in "*+?" and (i != last or prev in "()|"):
+            return None
+        prev = c
+    try:
+        return re.compile(pattern_lower, re.DOTALL)
+    except re.error:
+        # 本引擎容忍的写法（如不配对的括号）仍由NFA处理
+        return None
+
+
+@lru_cache(maxsize=TOKENS_CACHE_SIZE)
+def _tokens_cached(text: str, use_initials: bool, use_fuzzy: bool, split_chars: bool) -> Tokens:
+    """带LRU缓存的文本token化
+
+    返回结构数组形式的不可变token序列，可在多次调用间共享。
+
+    Args:
+        text: 输入文本
+        use_initials: 是否启用声母索引
+        use_fuzzy: 是否启用模糊音
+        split_chars: 是否按字符分割
+
+    Returns:
+        结构数组形式的token序列
+    """
+    return text_to_token_arrays(
+        text, use_initials=use_initials, use_fuzzy=use_fuzzy, split_chars=split_chars
+    )
+
+
+@lru_cache(maxsize=TOKENS_CACHE_SIZE)
+def _tokens_default(text: str) -> Tokens:
+    """默认选项下带LRU缓存的文本token化
+
+    默认选项是最常见的调用方式，单独缓存后以文本本身作为缓存键，
+    省去关键字参数打包和组合键元组的构造。
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        结构数组形式的token序列
+    """
+    return text_to_token_arrays(text)
+
+
+def clear_cache() -> None:
+    """清空模式编译缓存和token缓存"""
+    _compile_cached.cache_clear()
+    _plain_regex_cached.cache_clear()
+    _tokens_cached.cache_clear()
+    _tokens_default.cache_clear()
+
+
+def _match_text(
+    nfa: LazyDFA,
+    plain: Optional["re.Pattern[str]"],
+    text: str,
+    use_initials: bool,
+    use_fuzzy: bool,
+    split_chars: bool,
+) -> bool:
+    """用已编译的模式匹配一段文本
+
+    Args:
+        nfa: 已编译的惰性DFA
+        plain: 同一模式的标准库正则（见 _plain_regex_cached），可为None
+        text: 要搜索的文本
+        use_initials: 是否启用首字母匹配
+        use_fuzzy: 是否启用模糊音匹配
+        split_chars: 是否按字符分割
+
+    Returns:
+        是否匹配成功
+    """
+    # 纯ASCII文本没有汉字读音，可以交给标准库正则，省去token化和逐token模拟
+    if plain is not None and split_chars and text.isascii():
+        return plain.search(text) is not None
+    if use_initials and use_fuzzy and split_chars:
+        tokens = _tokens_default(text)
+    else:
+        tokens = _tokens_cached(text, use_initials, use_fuzzy, split_chars)
+    # 预筛：首字符都对不上时无需运行NFA模拟
+    return nfa.may_match(tokens) and nfa.match(tokens)
+
+
 def pinyin_regex_match(
     pattern: str,
     text: str,
@@ -63,11 +211,84 @@ def pinyin_regex_match(
         >>> pinyin_regex_match("yin(yue|le)", "音乐")  # 正则表达式
         True
     """
-    start_state = compile_regex(pattern.lower())
-    tokens = text_to_tokens(
-        text, use_initials=use_initials, use_fuzzy=use_fuzzy, split_chars=split_chars
+    pattern_lower = pattern.lower()
+    return _match_text(
+        _compile_cached(pattern_lower),
+        _plain_regex_cached(pattern_lower),
+        text,
+        use_initials,
+        use_fuzzy,
+        split_chars,
     )
-    return run_pinyin_regex(start_state, tokens)
+
+
+def match_compiled(
+    compiled: LazyDFA,
+    text: str,
+    use_initials: bool = True,
+    use_fuzzy: bool = True,
+    split_chars: bool = True,
+) -> bool:
+    """用预先编译好的模式匹配文本
+
+    在循环中反复匹配同一模式时，可先用 compile_regex_dfa 编译一次，
+    省去每次调用时的模式小写化和编译缓存查找。
+
+    Args:
+        compiled: compile_regex_dfa 返回的惰性DFA（模式需为小写）
+        text: 要搜索的中文文本
+        use_initials: 是否启用首字母匹配，默认True
+        use_fuzzy: 是否启用模糊音匹配，默认True
+        split_chars: 是否按字符分割，默认True
+
+    Returns:
+        是否匹配成功
+
+    Examples:
+        >>> dfa = compile_regex_dfa("yinyue")
+        >>> match_compiled(dfa, "背景音乐")
+        True
+    """
+    return _match_text(compiled, None, text, use_initials, use_fuzzy, split_chars)
+
+
+def pinyin_regex_match_many(
+    pattern: str,
+    texts: Iterable[str],
+    use_initials: bool = True,
+    use_fuzzy: bool = True,
+    split_chars: bool = True,
+) -> List[bool]:
+    """使用同一个模式批量匹配多个文本
+
+    模式只编译一次，在所有文本间复用；同一批次中重复出现的文本只匹配一次。
+
+    Args:
+        pattern: 拼音正则表达式模式
+        texts: 要搜索的中文文本序列
+        use_initials: 是否启用首字母匹配，默认True
+        use_fuzzy: 是否启用模糊音匹配，默认True
+        split_chars: 是否按字符分割，默认True
+
+    Returns:
+        与texts一一对应的匹配结果列表
+
+    Examples:
+        >>> pinyin_regex_match_many("yinyue", ["音乐", "背景音乐", "舞蹈"])
+        [True, True, False]
+    """
+    pattern_lower = pattern.lower()
+    nfa = _compile_cached(pattern_lower)
+    plain = _plain_regex_cached(pattern_lower)
+    seen: Dict[str, bool] = {}
+    results = []
+    for text in texts:
+        result = seen.get(text)
+        if result is None:
+            result = _match_text(nfa, plain, text, use_initials, use_fuzzy, split_chars)
+            seen[text] = result
+        results.append(result)
+    return results
 
 
 # 导出公共API
@@ -77,19 +298,30 @@ __all__ = [
     "__author__",
     # 主要API
     "pinyin_regex_match",
+    "pinyin_regex_match_many",
+    "match_compiled",
+    "clear_cache",
     # 拼音工具
     "text_to_tokens",
+    "text_to_token_arrays",
+    "tokens_to_dicts",
+    "Tokens",
+    "preload_char_pinyins",
     "expand_pinyin",
     "get_shengmu",
     "INITIALS",
     "FUZZY_MAP",
     # 引擎核心
     "State",
+    "CompiledNFA",
+    "LazyDFA",
     "run_pinyin_regex",
     "epsilon_closure",
     "match_label",
     # 解析器
     "compile_regex",
+    "compile_pattern",
+    "compile_regex_dfa",
     # 异常类
     "PinyinRegexError",
     "PatternParseError",
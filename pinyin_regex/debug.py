@@ -6,12 +6,22 @@
 
 import time
 import os
-from typing import Set, Dict, List, Any, Optional, Union
+import statistics
+from array import array
+from functools import lru_cache
+from typing import AbstractSet, Set, Dict, FrozenSet, List, Any, Optional, Union
 from collections import defaultdict
 
-from .engine import State, epsilon_closure, advance_states
-from .pinyin_utils import text_to_tokens
-from .parser import compile_regex
+from .engine import (
+    BOUNDARY_CHARS,
+    State,
+    epsilon_closure,
+    advance_states_boundary,
+    advance_states_char,
+    run_pinyin_regex,
+)
+from .pinyin_utils import text_to_tokens, text_to_token_arrays
+from .parser import compile_regex, compile_regex_dfa
 
 # 可选的graphviz支持
 try:
@@ -21,6 +31,36 @@ try:
 except ImportError:
     GRAPHVIZ_AVAILABLE = False
 
+# 纳秒与秒的换算
+NS_PER_SECOND = 1_000_000_000
+
+# DOT标签转义表
+_DOT_ESCAPE = str.maketrans({'"': '\\"'})
+
+
+def _collect_states(start: State) -> List[State]:
+    """按广度优先顺序收集从起始状态可达的所有状态
+
+    Args:
+        start: NFA起始状态
+
+    Returns:
+        状态列表，起始状态在最前
+    """
+    states = [start]
+    seen = {start}
+    for s in states:
+        for t in s.eps:
+            if t not in seen:
+                seen.add(t)
+                states.append(t)
+        for targets in s.trans.values():
+            for t in targets:
+                if t not in seen:
+                    seen.add(t)
+                    states.append(t)
+    return states
+
 
 class NFAVisualizer:
     """NFA可视化工具类"""
@@ -75,45 +115,31 @@ class NFAVisualizer:
         Returns:
             DOT格式的字符串
         """
-        visited = set()
-        stack = [start]
-        lines = ["digraph NFA {"]
-        lines.append("  rankdir=LR;")
-        lines.append("  node [shape=circle];")
-
-        # 添加起始状态标记
-        lines.append(f"  start [shape=point, style=invis];")
-        lines.append(f'  start -> {id(start)} [label="start"];')
-
-        while stack:
-            s = stack.pop()
-            if s in visited:
-                continue
-            visited.add(s)
-
-            state_id = id(s)
-
-            # 接受状态用双圆圈
-            if s.accept:
-                lines.append(f"  {state_id} [shape=doublecircle];")
-
-            # epsilon转换
-            for e in s.eps:
-                lines.append(f'  {state_id} -> {id(e)} [label="ε", style=dashed];')
-
-            # 字符转换
-            for sym, targets in s.trans.items():
-                for t in targets:
-                    # 转义特殊字符
-                    safe_sym = str(sym).replace('"', '\\"')
-                    lines.append(f'  {state_id} -> {id(t)} [label="{safe_sym}"];')
-
-            stack.extend(s.eps)
-            for targets in s.trans.values():
-                stack.extend(targets)
-
-        lines.append("}")
-        return "\n".join(lines)
+        states = _collect_states(start)
+
+        header = [
+            "digraph NFA {",
+            "  rankdir=LR;",
+            "  node [shape=circle];",
+            # 添加起始状态标记
+            "  start [shape=point, style=invis];",
+            f'  start -> {id(start)} [label="start"];',
+        ]
+        # 接受状态用双圆圈
+        node_lines = [f"  {id(s)} [shape=doublecircle];" for s in states if s.accept]
+        # epsilon转换
+        eps_lines = [
+            f'  {id(s)} -> {id(e)} [label="ε", style=dashed];' for s in states for e in s.eps
+        ]
+        # 字符转换（转义特殊字符）
+        trans_lines = [
+            f'  {id(s)} -> {id(t)} [label="{str(sym).translate(_DOT_ESCAPE)}"];'
+            for s in states
+            for sym, targets in s.trans.items()
+            for t in targets
+        ]
+
+        return "\n".join(header + node_lines + eps_lines + trans_lines + ["}"])
 
     def render_graphviz(
         self, start: State, output_file: str = None, format: str = "png"
@@ -139,18 +165,12 @@ class NFAVisualizer:
         dot.attr(rankdir="LR")
         dot.attr("node", shape="circle")
 
-        visited = set()
-        stack = [start]
-
-        # 添加起始节点标记
+        # 添加起始节点标记并连接到起始状态
         dot.node("start", shape="point", style="invis")
+        dot.edge("start", str(id(start)), label="start", style="bold")
 
-        while stack:
-            s = stack.pop()
-            if s in visited:
-                continue
-            visited.add(s)
-
+        # 一次广度优先遍历同时生成节点和边
+        for s in _collect_states(start):
             state_id = str(id(s))
 
             # 设置节点样式
@@ -159,42 +179,17 @@ class NFAVisualizer:
             else:
                 dot.node(state_id, color="blue")
 
-        # 重新遍历以添加边
-        visited = set()
-        stack = [start]
-
-        # 连接起始节点到起始状态
-        dot.edge("start", str(id(start)), label="start", style="bold")
-
-        while stack:
-            s = stack.pop()
-            if s in visited:
-                continue
-            visited.add(s)
-
-            state_id = str(id(s))
-
             # epsilon转换
             for e in s.eps:
-                target_id = str(id(e))
-                dot.edge(state_id, target_id, label="ε", style="dashed", color="green")
-                stack.append(e)
+                dot.edge(state_id, str(id(e)), label="ε", style="dashed", color="green")
 
             # 字符转换
             for sym, targets in s.trans.items():
+                safe_sym = str(sym).translate(_DOT_ESCAPE)
+                # 特殊符号用紫色，普通符号用黑色
+                color = "purple" if isinstance(sym, str) and sym.startswith("<") else "black"
                 for t in targets:
-                    target_id = str(id(t))
-                    safe_sym = str(sym).replace('"', '\\"')
-
-                    # 根据符号类型设置颜色
-                    if isinstance(sym, str) and sym.startswith("<"):
-                        # 特殊符号用紫色
-                        dot.edge(state_id, target_id, label=safe_sym, color="purple")
-                    else:
-                        # 普通符号用黑色
-                        dot.edge(state_id, target_id, label=safe_sym, color="black")
-
-                    stack.append(t)
+                    dot.edge(state_id, str(id(t)), label=safe_sym, color=color)
 
         # 渲染图形
         if output_file:
@@ -230,8 +225,15 @@ class NFADebugger:
         self.step_history.clear()
 
         # 初始化状态集合，与run_pinyin_regex保持一致
-        start_closure = epsilon_closure({start_state})
-        current = set(start_closure)
+        # 起始闭包是不可变集合，直接作为初始状态集，不必复制
+        start_closure = start_state.eclosure
+        if start_closure is None:
+            start_closure = frozenset(epsilon_closure({start_state}))
+        current: AbstractSet[State] = start_closure
+        # 接受状态集合，判断是否接受只需与之求交集
+        accept_states = frozenset(s for s in _collect_states(start_state) if s.accept)
+        # 本次运行内的闭包缓存，重复出现的状态集合只计算一次闭包
+        closure_cache: Dict[FrozenSet[State], FrozenSet[State]] = {}
 
         if self.verbose:
             print(f"INIT: {[id(s) for s in current]}")
@@ -244,15 +246,20 @@ class NFADebugger:
             if self.verbose:
                 print(f"\nREAD TOKEN: {tok}")
 
-            nxt_states = set()
+            nxt_states: Set[State] = set()
             transition_count = 0
 
             # 与run_pinyin_regex保持一致的逻辑
             # text_to_tokens总是返回字典格式的token
+            ch_org = tok["char"]
+            is_boundary = ch_org in BOUNDARY_CHARS
             for py in tok.get("pinyins", []):
-                st = advance_states(current, tok["char"], py)
+                if is_boundary:
+                    st = advance_states_boundary(current, ch_org, closure_cache)
+                else:
+                    st = advance_states_char(current, ch_org, py, closure_cache)
                 # ⭐ 如果本 token 内已经到 accept，直接成功
-                if any(s.accept for s in st):
+                if not accept_states.isdisjoint(st):
                     if self.verbose:
                         print(f"EARLY ACCEPT at step {i}")
                     return True
@@ -277,9 +284,10 @@ class NFADebugger:
                 }
             )
 
-        accept = any(s.accept for s in current)
+        accepted = accept_states.intersection(current)
+        accept = bool(accepted)
         self.stats["final_states"] = len(current)
-        self.stats["accept_states"] = sum(1 for s in current if s.accept)
+        self.stats["accept_states"] = len(accepted)
 
         if self.verbose:
             print(f"\nACCEPT? {accept}")
@@ -308,11 +316,25 @@ class NFADebugger:
 
 
 class PerformanceProfiler:
-    """性能分析器"""
+    """性能分析器
 
-    def __init__(self):
-        self.timings: Dict[str, List[float]] = defaultdict(list)
+    耗时以整数纳秒（perf_counter_ns）记录在 timings 中，避免浮点相减带来的误差，
+    只在返回值和摘要中换算为秒。每种操作的耗时存为 array('q')，
+    比同样长度的整数列表占用更少内存。
+
+    Args:
+        reuse_compiled: 为True时 profile_matching 按小写模式缓存编译结果（LRU，
+            容量 COMPILE_CACHE_SIZE），编译和token化都在计时区间外完成，计时只覆盖匹配本身
+    """
+
+    def __init__(self, reuse_compiled: bool = False):
+        from . import COMPILE_CACHE_SIZE
+
+        self.timings: Dict[str, "array[int]"] = defaultdict(lambda: array("q"))
         self.memory_usage: List[int] = []
+        self.reuse_compiled = reuse_compiled
+        # 匹配选项只影响token化，编译结果只取决于小写模式
+        self._compiled = lru_cache(maxsize=COMPILE_CACHE_SIZE)(compile_regex_dfa)
 
     def profile_compilation(self, pattern: str) -> float:
         """分析正则表达式编译性能
@@ -323,17 +345,21 @@ class PerformanceProfiler:
         Returns:
             编译耗时（秒）
         """
-        start_time = time.perf_counter()
+        perf_counter_ns = time.perf_counter_ns
+        start_time = perf_counter_ns()
         compile_regex(pattern)
-        end_time = time.perf_counter()
+        end_time = perf_counter_ns()
 
         duration = end_time - start_time
         self.timings["compilation"].append(duration)
-        return duration
+        return duration / NS_PER_SECOND
 
-    def profile_matching(self, pattern: str, text: str, **options) -> float:
+    def profile_matching(self, pattern: str, text: str, **options: Any) -> float:
         """分析匹配性能
 
+        默认计时覆盖完整的 pinyin_regex_match 调用；启用 reuse_compiled 时，
+        同一模式只编译一次，计时只覆盖在已编译DFA上的匹配。
+
         Args:
             pattern: 正则表达式模式
             text: 匹配文本
@@ -342,31 +368,66 @@ class PerformanceProfiler:
         Returns:
             匹配耗时（秒）
         """
-        from . import pinyin_regex_match
+        # 计时区间内用到的函数预先绑定为局部变量，省去全局和属性查找
+        perf_counter_ns = time.perf_counter_ns
+        if self.reuse_compiled:
+            match = self._compiled(pattern.lower()).match
+            tokens = text_to_token_arrays(text, **options)
+
+            start_time = perf_counter_ns()
+            match(tokens)
+            end_time = perf_counter_ns()
+        else:
+            from . import pinyin_regex_match
 
-        start_time = time.perf_counter()
-        pinyin_regex_match(pattern, text, **options)
-        end_time = time.perf_counter()
+            start_time = perf_counter_ns()
+            pinyin_regex_match(pattern, text, **options)
+            end_time = perf_counter_ns()
 
         duration = end_time - start_time
         self.timings["matching"].append(duration)
-        return duration
+        return duration / NS_PER_SECOND
+
+    def profile_run(self, start_state: State, text: str, **options: Any) -> float:
+        """分析已编译NFA的运行性能
+
+        文本在计时区间外token化为结构数组形式的 Tokens，计时只覆盖NFA模拟本身，
+        与 profile_compilation 配合可分别衡量编译和匹配的开销。
+
+        Args:
+            start_state: 已编译的NFA起始状态
+            text: 匹配文本
+            **options: token化选项（use_initials, use_fuzzy, split_chars）
+
+        Returns:
+            运行耗时（秒）
+        """
+        tokens = text_to_token_arrays(text, **options)
+        perf_counter_ns = time.perf_counter_ns
+
+        start_time = perf_counter_ns()
+        run_pinyin_regex(start_state, tokens)
+        end_time = perf_counter_ns()
+
+        duration = end_time - start_time
+        self.timings["run"].append(duration)
+        return duration / NS_PER_SECOND
 
     def get_summary(self) -> Dict[str, Dict[str, float]]:
         """获取性能摘要
 
         Returns:
-            性能摘要字典
+            性能摘要字典，时间单位为秒
         """
         summary = {}
         for operation, times in self.timings.items():
             if times:
                 summary[operation] = {
                     "count": len(times),
-                    "total": sum(times),
-                    "average": sum(times) / len(times),
-                    "min": min(times),
-                    "max": max(times),
+                    "total": sum(times) / NS_PER_SECOND,
+                    "average": statistics.fmean(times) / NS_PER_SECOND,
+                    "min": min(times) / NS_PER_SECOND,
+                    "max": max(times) / NS_PER_SECOND,
                 }
         return summary
 
@@ -378,6 +439,14 @@ class PerformanceProfiler:
         """
         return time.perf_counter()
 
+    def perf_counter_ns(self) -> int:
+        """获取纳秒级高性能计时器
+
+        Returns:
+            当前时间（纳秒）
+        """
+        return time.perf_counter_ns()
+
 
 # 便捷函数，保持向后兼容
 def dump_nfa(start: State) -> None:
@@ -386,6 +455,18 @@ def dump_nfa(start: State) -> None:
     visualizer.dump_nfa(start)
 
 
+def count_states(start: State) -> int:
+    """统计从起始状态可达的NFA状态数
+
+    Args:
+        start: NFA起始状态
+
+    Returns:
+        状态数
+    """
+    return len(_collect_states(start))
+
+
 def debug_run(start_state: State, tokens: List[Any]) -> bool:
     """Debug run NFA (向后兼容函数)"""
     debugger = NFADebugger(verbose=True)
@@ -481,6 +562,7 @@ __all__ = [
     "NFADebugger",
     "PerformanceProfiler",
     "dump_nfa",
+    "count_states",
     "debug_run",
     "visualize_nfa",
     "render_nfa_graph",
@@ -4,20 +4,105 @@ NFA引擎核心模块
 实现非确定性有限自动机(NFA)的核心逻辑，包括状态管理、模式匹配等。
 """
 
-from typing import Set, Dict, Any, List, Union, Tuple, Optional
-from .pinyin_utils import text_to_tokens
+import string
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .pinyin_utils import Tokens
+
+# token输入：字典列表或结构数组形式的 Tokens
+TokenInput = Union[Tokens, Sequence[Dict[str, Any]]]
+
+
+def token_pinyins(tokens: TokenInput) -> Iterable[FrozenSet[str]]:
+    """按顺序返回每个token的拼音集合
+
+    Args:
+        tokens: 字典列表或结构数组形式的 Tokens
+
+    Returns:
+        拼音集合序列
+    """
+    if isinstance(tokens, Tokens):
+        return tokens.pinyins
+    return (token["pinyins"] for token in tokens)
+
+
+# 预先展开的转换：(标签, 目标集合, 匹配函数) 元组
+TransItems = Tuple[Tuple[Any, Set["State"], Callable[[str, str], bool]], ...]
 
 
 class State:
     """NFA状态类"""
 
-    def __init__(self):
-        self.eps: Set["State"] = set()  # epsilon转换
-        self.trans: Dict[Union[str, frozenset, Tuple], Set["State"]] = {}  # 字符转换
+    __slots__ = ("eps", "trans", "accept", "eclosure", "trans_items")
+
+    def __init__(self) -> None:
+        self.eps: Set[State] = set()  # epsilon转换
+        self.trans: Dict[Union[str, frozenset, Tuple], Set[State]] = {}  # 字符转换
         self.accept: bool = False  # 是否为接受状态
+        self.eclosure: Optional[FrozenSet[State]] = None  # 预计算的epsilon闭包，编译完成后设置
+        # 预先展开的 (标签, 目标集合, 匹配函数) 元组，编译完成后设置
+        self.trans_items: Optional[TransItems] = None
+
 
+def finalize_nfa(start: "State") -> None:
+    """为所有可达状态预计算epsilon闭包和转换元组
 
-def epsilon_closure(states: Set[State]) -> Set[State]:
+    闭包保存在 state.eclosure 中，转换列表连同各标签的匹配函数保存在 state.trans_items 中。
+
+    必须在NFA构造完成后调用，之后NFA不应再被修改。
+
+    Args:
+        start: NFA起始状态
+    """
+    states = [start]
+    seen = {start}
+    for s in states:
+        for t in s.eps:
+            if t not in seen:
+                seen.add(t)
+                states.append(t)
+        for targets in s.trans.values():
+            for t in targets:
+                if t not in seen:
+                    seen.add(t)
+                    states.append(t)
+
+    for s in states:
+        res = {s}
+        stack = [s]
+        while stack:
+            cur = stack.pop()
+            for e in cur.eps:
+                if e not in res:
+                    res.add(e)
+                    stack.append(e)
+        s.eclosure = frozenset(res)
+        s.trans_items = _trans_items(s)
+
+
+def _trans_items(s: State) -> TransItems:
+    """展开状态的转换为 (标签, 目标集合, 匹配函数) 元组"""
+    return tuple((label, targets, compile_matcher(label)) for label, targets in s.trans.items())
+
+
+def epsilon_closure(states: AbstractSet[State]) -> Set[State]:
     """计算epsilon闭包
 
     Args:
@@ -26,15 +111,26 @@ def epsilon_closure(states: Set[State]) -> Set[State]:
     Returns:
         epsilon闭包状态集合
     """
-    stack = list(states)
-    res = set(states)
+    res: Set[State] = set()
+    stack: List[State] = []
+
+    # 已预计算闭包的状态直接合并，其余状态回退到逐条遍历epsilon边
+    for s in states:
+        if s.eclosure is not None:
+            res |= s.eclosure
+        elif s not in res:
+            res.add(s)
+            stack.append(s)
 
     while stack:
         s = stack.pop()
         for e in s.eps:
             if e not in res:
-                res.add(e)
-                stack.append(e)
+                if e.eclosure is not None:
+                    res |= e.eclosure
+                else:
+                    res.add(e)
+                    stack.append(e)
 
     return res
 
@@ -53,10 +149,10 @@ def match_label(label: Union[str, frozenset, Tuple], ch_org: str, ch: str) -> bo
     # 任意字符
     if label == ".":
         return ch_org not in {"<BOS>", "<EOS>"}
-    
+
     if label == "<BOS>":
         return label == ch
-    
+
     if label == "<EOS>":
         return label == ch
 
@@ -85,46 +181,131 @@ def match_label(label: Union[str, frozenset, Tuple], ch_org: str, ch: str) -> bo
     return ch == label
 
 
+# 边界token的字符（文本首尾的 <BOS>/<EOS>），按整体转换而不逐字符推进
+BOUNDARY_CHARS = frozenset({"<BOS>", "<EOS>"})
+
+
+# \w 匹配的ASCII字母和数字：单字符原始字符只需一次集合查找
+_ASCII_ALNUM = frozenset(string.ascii_letters + string.digits)
+
+# \z 匹配的中文字符区间，直接比较字符串，省去 ord 调用
+_HAN_FIRST = "\u4e00"
+_HAN_LAST = "\u9fff"
+
+
+# 匹配函数缓存容量
+MATCHER_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def compile_matcher(label: Union[str, frozenset, Tuple]) -> Callable[[str, str], bool]:
+    """把标签编译为专用的匹配函数 matcher(ch_org, ch)
+
+    与 match_label 的判断逻辑完全一致，但分支在编译时就已确定，
+    匹配时只需一次函数调用。结果按标签缓存。
+
+    Args:
+        label: 匹配标签
+
+    Returns:
+        匹配函数
+    """
+    if label == ".":
+        return lambda ch_org, ch: ch_org not in BOUNDARY_CHARS
+    if label == "<BOS>" or label == "<EOS>":
+        return lambda ch_org, ch: ch == label
+    if isinstance(label, str) and label.startswith("\\"):
+        if label == r"\d":
+            return lambda ch_org, ch: ch_org.isdigit()
+        if label == r"\w":
+            return lambda ch_org, ch: ch_org in _ASCII_ALNUM or (
+                len(ch_org) > 1 and ch_org.isascii() and ch_org.isalnum()
+            )
+        if label == r"\s":
+            return lambda ch_org, ch: ch_org.isspace()
+        if label == r"\z":
+            # 多字符串即使落在区间内也被长度检查排除
+            return lambda ch_org, ch: _HAN_FIRST <= ch_org <= _HAN_LAST and len(ch_org) == 1
+    if isinstance(label, frozenset):
+        return lambda ch_org, ch: ch in label
+    if isinstance(label, tuple) and label[0] == "NEG":
+        negated = label[1]
+        return lambda ch_org, ch: ch not in negated
+    return lambda ch_org, ch: ch == label
+
+
 # =========================
 # Thompson 构造
 # =========================
 class Frag:
     """NFA片段类"""
 
+    __slots__ = ("start", "end")
+
     def __init__(self, start: State, end: State):
         self.start = start
         self.end = end
 
-def clone_frag(frag):
+
+def clone_frag(frag: Frag) -> Frag:
     """复制片段
+
+    先广度优先收集所有可达状态并创建副本，再按映射复制边，
+    不使用递归，深层重复（如 a{500}）也不会触及递归深度限制。
+
     Args:
         frag: 片段
+
+    Returns:
+        复制后的片段
     """
-    state_map = {}  # old_state -> new_state
+    state_map: Dict[State, State] = {}  # old_state -> new_state
 
-    def clone_state(s):
+    # 1️⃣ 收集可达状态并创建新状态
+    queue = deque([frag.start])
+    while queue:
+        s = queue.popleft()
         if s in state_map:
-            return state_map[s]
-
-        # 1️⃣ 创建新状态（先放进 map，防止递归环）
+            continue
         new_s = State()
         new_s.accept = s.accept
         state_map[s] = new_s
+        queue.extend(s.eps)
+        for targets in s.trans.values():
+            queue.extend(targets)
+
+    # 2️⃣ 复制 ε 边和字符转移
+    for s, new_s in state_map.items():
+        new_s.eps = {state_map[t] for t in s.eps}
+        new_s.trans = {sym: {state_map[t] for t in targets} for sym, targets in s.trans.items()}
+
+    return Frag(state_map[frag.start], state_map[frag.end])
+
 
-        # 2️⃣ 复制 ε 边
-        for nxt in s.eps:
-            new_s.eps.add(clone_state(nxt))
+# 标签驻留表容量
+LABEL_INTERN_SIZE = 4096
 
-        # 3️⃣ 复制字符转移
-        for sym, targets in s.trans.items():
-            new_s.trans[sym] = {clone_state(t) for t in targets}
+# 标签驻留表：相同的标签（如多次出现的 [a-z]）共享同一个对象，
+# 之后以标签为键的字典查找可以直接按对象身份命中，不必逐元素比较集合
+_label_intern: Dict[Union[str, frozenset, Tuple], Union[str, frozenset, Tuple]] = {}
 
-        return new_s
 
-    new_start = clone_state(frag.start)
-    new_end = state_map[frag.end]
+def intern_label(label: Union[str, frozenset, Tuple]) -> Union[str, frozenset, Tuple]:
+    """返回与 label 相等的共享标签对象
+
+    Args:
+        label: 字符标签
+
+    Returns:
+        驻留后的标签
+    """
+    shared = _label_intern.get(label)
+    if shared is None:
+        shared = label
+        if len(_label_intern) < LABEL_INTERN_SIZE:
+            _label_intern[label] = label
+    return shared
 
-    return Frag(new_start, new_end)
 
 def literal_frag(label: Union[str, frozenset, Tuple]) -> Frag:
     """创建字面量片段
@@ -136,7 +317,7 @@ def literal_frag(label: Union[str, frozenset, Tuple]) -> Frag:
         NFA片段
     """
     s1, s2 = State(), State()
-    s1.trans.setdefault(label, set()).add(s2)
+    s1.trans[intern_label(label)] = {s2}
     return Frag(s1, s2)
 
 
@@ -165,7 +346,8 @@ def alt_frag(a: Frag, b: Frag) -> Frag:
         选择片段
     """
     s, e = State(), State()
-    s.eps |= {a.start, b.start}
+    s.eps.add(a.start)
+    s.eps.add(b.start)
     a.end.eps.add(e)
     b.end.eps.add(e)
     return Frag(s, e)
@@ -181,8 +363,10 @@ def star_frag(a: Frag) -> Frag:
         星号片段
     """
     s, e = State(), State()
-    s.eps |= {a.start, e}
-    a.end.eps |= {a.start, e}
+    s.eps.add(a.start)
+    s.eps.add(e)
+    a.end.eps.add(a.start)
+    a.end.eps.add(e)
     return Frag(s, e)
 
 
@@ -197,7 +381,8 @@ def plus_frag(a: Frag) -> Frag:
     """
     s, e = State(), State()
     s.eps.add(a.start)
-    a.end.eps |= {a.start, e}
+    a.end.eps.add(a.start)
+    a.end.eps.add(e)
     return Frag(s, e)
 
 
@@ -211,7 +396,8 @@ def question_frag(a: Frag) -> Frag:
         问号片段
     """
     s, e = State(), State()
-    s.eps |= {a.start, e}
+    s.eps.add(a.start)
+    s.eps.add(e)
     a.end.eps.add(e)
     return Frag(s, e)
 
@@ -228,11 +414,39 @@ def count_frag(a: Frag, count: int) -> Optional[Frag]:
     """
     if count <= 0:
         return question_frag(a) if count == 0 else star_frag(a)
-    
-    result = a
-    for _ in range(count - 1):
-        result = concat_frag(result, clone_frag(a))
-    return result
+    if count == 1:
+        return a
+
+    # 先复制一份未被连接过的模板，其余副本都从模板按倍增构造
+    return concat_frag(a, _repeat_frag(clone_frag(a), count - 1))
+
+
+def _repeat_frag(template: Frag, count: int) -> Frag:
+    """用倍增法把模板片段重复 count 次（count >= 1）
+
+    每轮把当前块与它的副本连接使长度翻倍，按 count 的二进制位取用各个块，
+    复制操作只需 O(log count) 次，新建状态数与 count 成线性关系。
+
+    Args:
+        template: 未与其他片段连接的模板片段，会被消耗
+        count: 重复次数
+
+    Returns:
+        重复后的片段
+    """
+    result: Optional[Frag] = None
+    block = template
+    while True:
+        if count & 1:
+            # 块还要继续倍增时取它的副本，否则直接使用
+            part = clone_frag(block) if count > 1 else block
+            result = part if result is None else concat_frag(result, part)
+        count >>= 1
+        if not count:
+            # count 至少为1，最高位一定会被拼接进结果
+            assert result is not None
+            return result
+        block = concat_frag(block, clone_frag(block))
 
 
 def range_frag(a: Frag, min_count: int, max_count: Union[int, float]) -> Frag:
@@ -305,62 +519,953 @@ def range_frag(a: Frag, min_count: int, max_count: Union[int, float]) -> Frag:
     return Frag(s, e)
 
 
-def advance_states(states: Set[State], ch_org: str, s: str) -> Set[State]:
+def _closure(
+    states: AbstractSet[State], closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]]
+) -> AbstractSet[State]:
+    """计算epsilon闭包，提供缓存字典时按状态集合记忆结果"""
+    if closure_cache is None:
+        return epsilon_closure(states)
+    key = frozenset(states)
+    res = closure_cache.get(key)
+    if res is None:
+        res = closure_cache[key] = frozenset(epsilon_closure(key))
+    return res
+
+
+def advance_states(
+    states: AbstractSet[State],
+    ch_org: str,
+    s: str,
+    closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]] = None,
+) -> AbstractSet[State]:
     """让NFA状态集推进一个字符
 
+    按 s 是否为边界符号分派到 advance_states_boundary 或 advance_states_char；
+    已知token类型的调用方可以直接调用对应的函数。
+
+    Args:
+        states: 当前状态集合
+        ch_org: 原始字符
+        s: 要匹配的字符串
+        closure_cache: 可选的闭包缓存字典，在一次匹配中重复出现的状态集合只计算一次闭包；
+            提供时返回的是共享的不可变集合
+
+    Returns:
+        推进后的状态集合
+    """
+    if s in BOUNDARY_CHARS:
+        return _advance_closed_boundary(_closure(states, closure_cache), s, closure_cache)
+    return _advance_closed_char(_closure(states, closure_cache), ch_org, s, closure_cache)
+
+
+def advance_states_char(
+    states: AbstractSet[State],
+    ch_org: str,
+    s: str,
+    closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]] = None,
+) -> AbstractSet[State]:
+    """让NFA状态集逐字符推进一个拼音字符串（非边界token）
+
     Args:
         states: 当前状态集合
         ch_org: 原始字符
         s: 要匹配的字符串
+        closure_cache: 可选的闭包缓存字典
+
+    Returns:
+        推进后的状态集合
+    """
+    return _advance_closed_char(_closure(states, closure_cache), ch_org, s, closure_cache)
+
+
+def advance_states_boundary(
+    states: AbstractSet[State],
+    sym: str,
+    closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]] = None,
+) -> AbstractSet[State]:
+    """让NFA状态集推进一个边界符号（<BOS> 或 <EOS>）
+
+    Args:
+        states: 当前状态集合
+        sym: 边界符号，同时作为原始字符
+        closure_cache: 可选的闭包缓存字典
 
     Returns:
         推进后的状态集合
     """
-    cur = epsilon_closure(states)
+    return _advance_closed_boundary(_closure(states, closure_cache), sym, closure_cache)
 
-    if s in {"<BOS>", "<EOS>"}:
+
+def _advance_closed_char(
+    cur: AbstractSet[State],
+    ch_org: str,
+    s: str,
+    closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]] = None,
+) -> AbstractSet[State]:
+    """让已经过epsilon闭包的NFA状态集逐字符推进一个拼音字符串
+
+    假定输入状态集已经闭包，省去重复的闭包计算。
+
+    Args:
+        cur: 已闭包的当前状态集合
+        ch_org: 原始字符
+        s: 要匹配的字符串
+        closure_cache: 可选的闭包缓存字典
+
+    Returns:
+        推进后的状态集合
+    """
+    for ch in s:
+        nxt = set()
         for st in cur:
-            for label, to_states in st.trans.items():
-                if match_label(label, ch_org, s):
-                    cur = epsilon_closure(to_states)
-    else:
-        for ch in s:
-            nxt = set()
-            for st in cur:
-                for label, to_states in st.trans.items():
-                    if match_label(label, ch_org, ch):
-                        nxt |= to_states
-            cur = epsilon_closure(nxt)
-            if not cur:
-                break
+            items = st.trans_items if st.trans_items is not None else _trans_items(st)
+            for _, to_states, matcher in items:
+                if matcher(ch_org, ch):
+                    nxt |= to_states
+        cur = _closure(nxt, closure_cache)
+        if not cur:
+            break
 
     return cur
 
 
-def run_pinyin_regex(start_state: State, tokens: List[Dict[str, Any]]) -> bool:
-    """运行拼音正则表达式匹配
+def _advance_closed_boundary(
+    cur: AbstractSet[State],
+    sym: str,
+    closure_cache: Optional[Dict[FrozenSet[State], FrozenSet[State]]] = None,
+) -> AbstractSet[State]:
+    """让已经过epsilon闭包的NFA状态集推进一个边界符号
+
+    匹配到边界转换时取所有目标的并集，否则状态集保持不变。
 
     Args:
-        start_state: NFA起始状态
-        tokens: 拼音token列表
+        cur: 已闭包的当前状态集合
+        sym: 边界符号
+        closure_cache: 可选的闭包缓存字典
 
     Returns:
-        是否匹配成功
+        推进后的状态集合
     """
-    start_closure = epsilon_closure({start_state})
-    current = set(start_closure)
+    nxt = set()
+    for st in cur:
+        items = st.trans_items if st.trans_items is not None else _trans_items(st)
+        for _, to_states, matcher in items:
+            if matcher(sym, sym):
+                nxt |= to_states
+    if nxt:
+        return _closure(nxt, closure_cache)
+    return cur
+
+
+# 拼音首字符位掩码：ASCII字符 c 占第 ord(c) 位，其余字符共用第 128 位
+_OTHER_HEAD_BIT = 1 << 128
+
+# 拼音集合 -> 首字符位掩码的缓存容量
+HEAD_MASK_CACHE_SIZE = 65536
+
+_head_masks: Dict[FrozenSet[str], int] = {}
+
+
+def head_bit(ch: str) -> int:
+    """返回单个首字符对应的位"""
+    code = ord(ch)
+    return 1 << code if code < 128 else _OTHER_HEAD_BIT
+
+
+def pinyin_head_mask(pinyins: AbstractSet[str]) -> int:
+    """计算拼音集合中各拼音首字符的位掩码
+
+    不可变集合的结果按集合缓存；token化得到的拼音集合按字符共享，
+    重复出现的字符只需一次字典查找。
+
+    Args:
+        pinyins: 拼音集合
 
-    for token in tokens:
-        next_states = set()
+    Returns:
+        首字符位掩码
+    """
+    if type(pinyins) is frozenset:
+        mask = _head_masks.get(pinyins)
+        if mask is not None:
+            return mask
+    mask = 0
+    for py in pinyins:
+        if py:
+            mask |= head_bit(py[0])
+    if type(pinyins) is frozenset and len(_head_masks) < HEAD_MASK_CACHE_SIZE:
+        _head_masks[pinyins] = mask
+    return mask
+
+
+class CompiledNFA:
+    """扁平化布局的NFA
+
+    从起始状态按广度优先为所有状态编号（起始状态编号为0），
+    把epsilon转换和字符转换存为CSR风格的平行列表：
+    状态 i 的epsilon目标为 eps_indices[eps_indptr[i]:eps_indptr[i + 1]]，
+    字符转换为 trans_labels/trans_targets 在 [trans_indptr[i], trans_indptr[i + 1]) 内的条目。
+    匹配时只操作整数编号，不再遍历 State 对象。
+
+    状态集合以Python整数位掩码表示（第 i 位对应状态 i），closure_masks[i] 为状态 i 的
+    epsilon闭包位掩码，求并集只需按位或。step_masks/succ_masks 按标签编号预先汇总转换，
+    推进一步只需把当前状态与 step_masks[j] 按位与，再合并命中状态的 succ_masks[j]。
+
+    标签同样驻留为整数编号：labels[j] 是编号 j 对应的原始标签，trans_labels 中存的是编号。
+    构造完成后所有表都冻结为元组。
+    单字符字面量标签通过 literal_label_ids 直接由字符查到编号，
+    其余标签（通配符、字符类、转义类、边界符号）才需要调用各自编译好的匹配函数判断。
+    """
 
-        for py in token["pinyins"]:
-            st = advance_states(current, token["char"], py)
-            # ⭐ 如果本 token 内已经到 accept，直接成功
-            if any(s.accept for s in st):
+    def __init__(self, start: State):
+        states: List[State] = [start]
+        index: Dict[State, int] = {start: 0}
+        i = 0
+        while i < len(states):
+            s = states[i]
+            i += 1
+            for t in s.eps:
+                if t not in index:
+                    index[t] = len(states)
+                    states.append(t)
+            for targets in s.trans.values():
+                for t in targets:
+                    if t not in index:
+                        index[t] = len(states)
+                        states.append(t)
+
+        self.n_states: int = len(states)
+        self.accept: List[bool] = [s.accept for s in states]
+
+        self.eps_indptr: List[int] = [0]
+        self.eps_indices: List[int] = []
+        self.trans_indptr: List[int] = [0]
+        self.trans_labels: List[int] = []
+        self.trans_targets: List[int] = []
+
+        self.labels: List[Union[str, frozenset, Tuple]] = []
+        self.literal_label_ids: Dict[str, int] = {}
+        self.special_label_ids: List[int] = []
+        label_index: Dict[Union[str, frozenset, Tuple], int] = {}
+
+        for s in states:
+            self.eps_indices.extend(index[t] for t in s.eps)
+            self.eps_indptr.append(len(self.eps_indices))
+            entries: List[Tuple[int, int]] = []
+            for label, targets in s.trans.items():
+                label_id = label_index.get(label)
+                if label_id is None:
+                    label_id = label_index[label] = len(self.labels)
+                    self.labels.append(label)
+                    if isinstance(label, str) and len(label) == 1 and label != ".":
+                        self.literal_label_ids[label] = label_id
+                    else:
+                        self.special_label_ids.append(label_id)
+                entries.extend((label_id, index[t]) for t in targets)
+            # 每个状态的转换按标签编号排序，便于按标签查找
+            entries.sort()
+            for label_id, target in entries:
+                self.trans_labels.append(label_id)
+                self.trans_targets.append(target)
+            self.trans_indptr.append(len(self.trans_labels))
+
+        self.special_matchers: List[Tuple[int, Callable[[str, str], bool]]] = [
+            (label_id, compile_matcher(self.labels[label_id]))
+            for label_id in self.special_label_ids
+        ]
+        self._build_ascii_labels()
+
+        self._build_closure_masks()
+        self._freeze()
+
+    def _freeze(self) -> None:
+        """构造完成后把各表转为元组
+
+        编译结果会被缓存并在多次匹配间共享，冻结后不会被意外修改。
+        """
+        for name in (
+            "accept",
+            "eps_indptr",
+            "eps_indices",
+            "trans_indptr",
+            "trans_labels",
+            "trans_targets",
+            "labels",
+            "special_label_ids",
+            "special_matchers",
+            "closure_masks",
+            "step_masks",
+            "succ_masks",
+        ):
+            setattr(self, name, tuple(getattr(self, name)))
+
+    def transitions(self, i: int, label_id: int) -> Tuple[int, ...]:
+        """查找状态 i 经标签 label_id 的所有目标状态
+
+        Thompson构造的状态出边很少（通常不超过一条），转换已按标签编号排序，
+        线性扫描即可，无需哈希查找。
+
+        Args:
+            i: 状态编号
+            label_id: 标签编号
+
+        Returns:
+            目标状态编号元组
+        """
+        lo, hi = self.trans_indptr[i], self.trans_indptr[i + 1]
+        trans_labels = self.trans_labels
+        while lo < hi and trans_labels[lo] < label_id:
+            lo += 1
+        end = lo
+        while end < hi and trans_labels[end] == label_id:
+            end += 1
+        return tuple(self.trans_targets[lo:end])
+
+    def _build_ascii_labels(self) -> None:
+        """预计算每个ASCII字符匹配的、只取决于该字符本身的标签编号
+
+        字面量、字符集合和否定集合只看要匹配的字符，对ASCII字符（拼音字母都在其中）
+        预先算好，相当于每个字符类的ASCII位图按字符转置存放。依赖原始字符属性的标签
+        （通配符和转义类）仍在匹配时调用各自的匹配函数。
+        """
+        char_only: List[Tuple[int, Callable[[str, str], bool]]] = []
+        org_matchers: List[Tuple[int, Callable[[str, str], bool]]] = []
+        for label_id, matcher in self.special_matchers:
+            label = self.labels[label_id]
+            if isinstance(label, str) and label in _CHAR_PROPERTY_LABELS:
+                org_matchers.append((label_id, matcher))
+            else:
+                char_only.append((label_id, matcher))
+
+        ascii_labels: List[FrozenSet[int]] = []
+        for code in range(128):
+            ch = chr(code)
+            ids = {label_id for label_id, matcher in char_only if matcher("", ch)}
+            literal_id = self.literal_label_ids.get(ch)
+            if literal_id is not None:
+                ids.add(literal_id)
+            ascii_labels.append(frozenset(ids))
+        self.ascii_labels: Tuple[FrozenSet[int], ...] = tuple(ascii_labels)
+        self.org_matchers: Tuple[Tuple[int, Callable[[str, str], bool]], ...] = tuple(org_matchers)
+
+    def matching_labels(self, ch_org: str, ch: str) -> AbstractSet[int]:
+        """计算与字符匹配的所有标签编号
+
+        Args:
+            ch_org: 原始字符
+            ch: 要匹配的字符
+
+        Returns:
+            匹配的标签编号集合
+        """
+        if len(ch) == 1 and ch < "\x80":
+            ascii_matched = self.ascii_labels[ord(ch)]
+            if not self.org_matchers:
+                return ascii_matched
+            matched = set(ascii_matched)
+            for label_id, matcher in self.org_matchers:
+                if matcher(ch_org, ch):
+                    matched.add(label_id)
+            return matched
+
+        literal_id = self.literal_label_ids.get(ch)
+        matched = set() if literal_id is None else {literal_id}
+        for label_id, matcher in self.special_matchers:
+            if matcher(ch_org, ch):
+                matched.add(label_id)
+        return matched
+
+    def _build_closure_masks(self) -> None:
+        """预计算每个状态的epsilon闭包位掩码"""
+        eps_indptr, eps_indices = self.eps_indptr, self.eps_indices
+        self.closure_masks: List[int] = []
+
+        for i in range(self.n_states):
+            mask = 1 << i
+            stack = [i]
+            while stack:
+                j = stack.pop()
+                for k in range(eps_indptr[j], eps_indptr[j + 1]):
+                    e = eps_indices[k]
+                    bit = 1 << e
+                    if not mask & bit:
+                        mask |= bit
+                        stack.append(e)
+            self.closure_masks.append(mask)
+
+        self.accept_mask: int = 0
+        for i, is_accept in enumerate(self.accept):
+            if is_accept:
+                self.accept_mask |= 1 << i
+        self.start_mask: int = self.closure_masks[0]
+
+        # step_masks[j]：拥有标签 j 转换的源状态位掩码
+        # succ_masks[j][i]：状态 i 经标签 j 一步可达目标的闭包位掩码
+        self.step_masks: List[int] = [0] * len(self.labels)
+        self.succ_masks: List[Dict[int, int]] = [{} for _ in self.labels]
+        for i in range(self.n_states):
+            for k in range(self.trans_indptr[i], self.trans_indptr[i + 1]):
+                label_id = self.trans_labels[k]
+                self.step_masks[label_id] |= 1 << i
+                succ = self.succ_masks[label_id]
+                succ[i] = succ.get(i, 0) | self.closure_masks[self.trans_targets[k]]
+
+        self.live_mask: int = self._live_mask()
+        self.first_chars: Optional[FrozenSet[str]] = self._first_chars()
+        self.first_mask: int = 0
+        for ch in self.first_chars or ():
+            self.first_mask |= head_bit(ch)
+        self.anchored: bool = self._is_anchored()
+
+    def _live_mask(self) -> int:
+        """计算能到达接受状态的状态位掩码
+
+        在epsilon转换和字符转换组成的反向图上从接受状态出发广度优先遍历。
+        不在其中的状态无论之后读入什么都不可能接受，匹配时可以直接丢弃。
+        """
+        preds: List[List[int]] = [[] for _ in range(self.n_states)]
+        for i in range(self.n_states):
+            for k in range(self.eps_indptr[i], self.eps_indptr[i + 1]):
+                preds[self.eps_indices[k]].append(i)
+            for k in range(self.trans_indptr[i], self.trans_indptr[i + 1]):
+                preds[self.trans_targets[k]].append(i)
+
+        live = self.accept_mask
+        queue = deque(i for i, is_accept in enumerate(self.accept) if is_accept)
+        while queue:
+            for p in preds[queue.popleft()]:
+                bit = 1 << p
+                if not live & bit:
+                    live |= bit
+                    queue.append(p)
+        return live
+
+    def _is_anchored(self) -> bool:
+        """判断模式是否锚定在文本开头
+
+        起始闭包不可接受且所有出边都是 <BOS> 时，只有首个token能让起始状态前进，
+        之后无需在每个token后重新加入起始闭包。
+        """
+        if self.start_mask & self.accept_mask:
+            return False
+        active = self.start_mask
+        has_edge = False
+        while active:
+            low = active & -active
+            i = low.bit_length() - 1
+            active ^= low
+            for k in range(self.trans_indptr[i], self.trans_indptr[i + 1]):
+                if self.labels[self.trans_labels[k]] != "<BOS>":
+                    return False
+                has_edge = True
+        return has_edge
+
+    def _first_chars(self) -> Optional[FrozenSet[str]]:
+        """计算匹配必须消耗的首个字符集合
+
+        起始闭包只在每个token开始时加入，因此任何成功匹配消耗的第一个字符
+        必然是某个拼音字符串的首字符。仅当起始闭包的所有出边都是单字符字面量、
+        且起始闭包本身不可接受时才能确定该集合，否则返回None。
+        """
+        if self.start_mask & self.accept_mask:
+            return None
+        literal_chars = {label_id: ch for ch, label_id in self.literal_label_ids.items()}
+        chars: Set[str] = set()
+        active = self.start_mask
+        while active:
+            low = active & -active
+            i = low.bit_length() - 1
+            active ^= low
+            for k in range(self.trans_indptr[i], self.trans_indptr[i + 1]):
+                ch = literal_chars.get(self.trans_labels[k])
+                if ch is None:
+                    return None
+                chars.add(ch)
+        return frozenset(chars)
+
+    def may_match(self, tokens: TokenInput) -> bool:
+        """快速预筛：判断tokens是否可能被匹配
+
+        若没有任何拼音字符串以 first_chars 中的字符开头，则一定不匹配。
+        返回True只表示需要继续运行NFA模拟。
+
+        每个token的拼音首字符预先汇总为位掩码（见 pinyin_head_mask），
+        与 first_mask 按位与即可判断；非ASCII首字符共用一位，只会让预筛更保守。
+
+        Args:
+            tokens: 拼音token序列
+
+        Returns:
+            是否可能匹配
+        """
+        if self.first_chars is None:
+            return True
+        first_mask = self.first_mask
+        head_masks = _head_masks
+        for pinyins in token_pinyins(tokens):
+            mask = head_masks.get(pinyins) if type(pinyins) is frozenset else None
+            if mask is None:
+                mask = pinyin_head_mask(pinyins)
+            if mask & first_mask:
                 return True
-            next_states |= st
+        return False
+
+    def closure(self, mask: int) -> int:
+        """计算状态位掩码的epsilon闭包
+
+        Args:
+            mask: 初始状态位掩码
+
+        Returns:
+            epsilon闭包状态位掩码
+        """
+        closure_masks = self.closure_masks
+        res = 0
+        while mask:
+            low = mask & -mask
+            res |= closure_masks[low.bit_length() - 1]
+            mask ^= low
+        return res
+
+    def _step(self, active: int, matched: AbstractSet[int]) -> int:
+        """沿匹配标签的转换推进一步，返回目标状态的闭包位掩码"""
+        step_masks = self.step_masks
+        succ_masks = self.succ_masks
+
+        nxt = 0
+        for label_id in matched:
+            a = active & step_masks[label_id]
+            if not a:
+                continue
+            succ = succ_masks[label_id]
+            while a:
+                low = a & -a
+                nxt |= succ[low.bit_length() - 1]
+                a ^= low
+        return nxt
+
+    def advance(self, active: int, ch_org: str, s: str) -> int:
+        """让已闭包的状态位掩码推进一个拼音字符串
+
+        按 s 是否为边界符号分派到 advance_boundary 或 advance_char。
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            ch_org: 原始字符
+            s: 要匹配的字符串
+
+        Returns:
+            推进后的已闭包状态位掩码
+        """
+        if s in BOUNDARY_CHARS:
+            return self.advance_boundary(active, s)
+        return self.advance_char(active, ch_org, s)
+
+    def advance_boundary(self, active: int, sym: str) -> int:
+        """让已闭包的状态位掩码推进一个边界符号
+
+        匹配到边界转换时取所有目标的并集，否则状态保持不变。
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            sym: 边界符号，同时作为原始字符
+
+        Returns:
+            推进后的已闭包状态位掩码
+        """
+        matched = self.matching_labels(sym, sym)
+        nxt = self._step(active, matched) if matched else 0
+        return nxt or active
+
+    def advance_token(self, active: int, ch_org: str, pinyins: AbstractSet[str]) -> int:
+        """让已闭包的状态位掩码读入一个非边界token
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            ch_org: 原始字符
+            pinyins: 该token的拼音集合
+
+        Returns:
+            各拼音推进结果的并集
+        """
+        # 只有起始闭包活跃时，没有拼音以 first_chars 开头的token不可能推进任何状态，
+        # 按首字符位掩码直接跳过（类似 Boyer-Moore 的坏字符跳转，但以token为单位）
+        if active == self.start_mask and self.first_chars is not None:
+            if not pinyin_head_mask(pinyins) & self.first_mask:
+                return 0
+        nxt = 0
+        for py in pinyins:
+            nxt |= self.advance_char(active, ch_org, py)
+        return nxt
+
+    def advance_char(self, active: int, ch_org: str, s: str) -> int:
+        """让已闭包的状态位掩码逐字符推进一个拼音字符串（非边界token）
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            ch_org: 原始字符
+            s: 要匹配的字符串
+
+        Returns:
+            推进后的已闭包状态位掩码
+        """
+        for ch in s:
+            matched = self.matching_labels(ch_org, ch)
+            if not matched:
+                return 0
+            active = self._step(active, matched)
+            if not active:
+                break
+
+        return active
+
+
+# 惰性DFA转换表容量上限，超出后清空重建
+DFA_CACHE_SIZE = 10000
+
+
+# 惰性DFA状态数上限，超出后认为发生状态爆炸，退回NFA模拟
+DFA_STATE_LIMIT = 2000
+
+# 依赖原始字符属性的标签
+_CHAR_PROPERTY_LABELS = {".", r"\d", r"\w", r"\s", r"\z"}
+
+
+# 属性签名缓存容量
+SIGNATURE_CACHE_SIZE = 4096
+
+
+def _compute_signature(ch_org: str) -> int:
+    """计算原始字符的属性签名（不查缓存）"""
+    sig = 0
+    if ch_org in BOUNDARY_CHARS:
+        sig |= 1
+    if ch_org.isdigit():
+        sig |= 2
+    if ch_org.isascii() and ch_org.isalnum():
+        sig |= 4
+    if ch_org.isspace():
+        sig |= 8
+    if len(ch_org) == 1 and 0x4E00 <= ord(ch_org) <= 0x9FFF:
+        sig |= 16
+    return sig
+
+
+# 属性签名表：导入时预先填好Latin-1字符和边界符号，其余字符首次遇到时加入
+_signatures: Dict[str, int] = {
+    ch: _compute_signature(ch) for ch in [*map(chr, range(256)), *BOUNDARY_CHARS]
+}
+
+
+def char_signature(ch_org: str) -> int:
+    """计算原始字符的属性签名
+
+    match_label 对原始字符只关心以下属性，签名相同的原始字符在任何标签上的匹配结果相同：
+    是否为边界符号、\\d、\\w、\\s、\\z。结果按字符缓存，重复出现的字符只需一次字典查找。
+
+    Args:
+        ch_org: 原始字符
+
+    Returns:
+        属性位掩码
+    """
+    sig = _signatures.get(ch_org)
+    if sig is None:
+        sig = _compute_signature(ch_org)
+        if len(_signatures) < SIGNATURE_CACHE_SIZE:
+            _signatures[ch_org] = sig
+    return sig
+
+
+class LazyDFA:
+    """按需子集构造的DFA
+
+    DFA状态即NFA状态位掩码。标签匹配只取决于要匹配的字符和原始字符的属性签名
+    （见 char_signature），因此 (状态位掩码, 属性签名, 字符) -> 下一状态位掩码
+    的转换在首次遇到时由NFA计算并缓存，之后同样的转换只需一次字典查找。
+    模式不含依赖原始字符属性的标签时签名恒为0。
+
+    遇到的DFA状态数超过 DFA_STATE_LIMIT 时停止缓存，之后直接使用NFA模拟。
+
+    对字面量选择模式（如 (beijing|shanghai)），子串搜索的NFA是一棵字典树加上每个token后
+    重新加入的起始闭包，其子集构造得到的正是带直接转换（不再回溯失败链接）的 Aho-Corasick
+    自动机，因此无需为这类模式单独实现多模式匹配器。
+
+    run_pinyin_regex 按token推进，因此在逐字符转换之上还缓存了整个token的转换：
+    同一DFA状态再次读入相同的拼音集合时只需一次查找（见 advance_token）。
+
+    对外提供与 CompiledNFA 相同的 start_mask、accept_mask、live_mask、first_chars、anchored、
+    advance、advance_token 和 may_match，可直接传给 run_pinyin_regex；
+    match 是针对本模式特化的等价匹配函数，只接受 Tokens。
+    """
+
+    def __init__(self, nfa: CompiledNFA):
+        self.nfa = nfa
+        self.start_mask: int = nfa.start_mask
+        self.accept_mask: int = nfa.accept_mask
+        self.first_chars: Optional[FrozenSet[str]] = nfa.first_chars
+        self.anchored: bool = nfa.anchored
+        self.live_mask: int = nfa.live_mask
+        self.uses_char_properties: bool = any(
+            nfa.labels[i] in _CHAR_PROPERTY_LABELS
+            for i in nfa.special_label_ids
+            if isinstance(nfa.labels[i], str)
+        )
+        # 属性签名 -> 状态位掩码 -> 字符 -> 下一状态位掩码
+        # 签名在同一token内不变，逐字符推进时只需两次以整数和字符为键的查找，无需构造元组键
+        self.trans: Dict[int, Dict[int, Dict[str, int]]] = {}
+        # token键 -> 状态位掩码 -> 读入整个token后的下一状态位掩码
+        # token键为拼音集合本身（用到原始字符属性时再加上签名）；同一字符的拼音集合是共享对象，
+        # 其哈希值已缓存，相等判断按对象身份即可命中，一个token只需两次字典查找
+        self.token_trans: Dict[Any, Dict[int, int]] = {}
+        self.n_trans: int = 0
+        self.states: Set[int] = {nfa.start_mask}
+        self.fallback: bool = False
+        self._lock = threading.Lock()
+        # 针对本模式特化的匹配函数，见 _specialize_match
+        self.match: Callable[[Tokens], bool] = self._specialize_match()
+
+    def _admit(self, active: int, nxt: int) -> bool:
+        """登记一条新转换涉及的DFA状态，返回这条转换能否缓存
+
+        状态数超过 DFA_STATE_LIMIT 时进入退回模式并清空所有缓存；
+        转换数达到 DFA_CACHE_SIZE 时清空后重新累计。
+        编译结果会在线程间共享，登记和清空在锁内进行；查表不加锁，
+        读到已清空的行只会导致重新计算。
+        """
+        with self._lock:
+            if self.fallback:
+                return False
+            states = self.states
+            states.add(active)
+            states.add(nxt)
+            if len(states) > DFA_STATE_LIMIT:
+                self.fallback = True
+                self.trans.clear()
+                self.token_trans.clear()
+                self.n_trans = 0
+                states.clear()
+                return False
+            if self.n_trans >= DFA_CACHE_SIZE:
+                # 清空各签名下的行，保留 rows 对象本身以便调用方继续使用
+                for by_mask in self.trans.values():
+                    by_mask.clear()
+                self.token_trans.clear()
+                self.n_trans = 0
+            self.n_trans += 1
+            return True
+
+    def _add(self, rows: Dict[int, Dict[str, int]], active: int, ch: str, nxt: int) -> int:
+        """缓存一条逐字符转换"""
+        if self._admit(active, nxt):
+            row = rows.get(active)
+            if row is None:
+                row = rows[active] = {}
+            row[ch] = nxt
+        return nxt
+
+    def advance(self, active: int, ch_org: str, s: str) -> int:
+        """让已闭包的状态位掩码推进一个拼音字符串，同 CompiledNFA.advance"""
+        if s in BOUNDARY_CHARS:
+            return self.advance_boundary(active, s)
+        return self.advance_char(active, ch_org, s)
+
+    def _rows(self, sig: int) -> Dict[int, Dict[str, int]]:
+        """取属性签名对应的转换行"""
+        rows = self.trans.get(sig)
+        if rows is None:
+            # 新增签名会改变 trans 的大小，与 _admit 中的遍历互斥
+            with self._lock:
+                rows = self.trans.setdefault(sig, {})
+        return rows
+
+    def advance_boundary(self, active: int, sym: str) -> int:
+        """让已闭包的状态位掩码推进一个边界符号，边界符号作为整体转换
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            sym: 边界符号
+
+        Returns:
+            推进后的已闭包状态位掩码
+        """
+        nfa = self.nfa
+        if self.fallback:
+            return nfa.advance_boundary(active, sym)
+
+        rows = self._rows(char_signature(sym) if self.uses_char_properties else 0)
+        row = rows.get(active)
+        nxt = row.get(sym) if row is not None else None
+        if nxt is None:
+            nxt = self._add(rows, active, sym, nfa.advance_boundary(active, sym))
+        return nxt
+
+    def advance_token(self, active: int, ch_org: str, pinyins: AbstractSet[str]) -> int:
+        """让已闭包的状态位掩码读入一个非边界token，同 CompiledNFA.advance_token
+
+        整个token的转换按token键缓存；拼音集合不可哈希（如手工构造的 set）时逐个拼音推进。
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            ch_org: 原始字符
+            pinyins: 该token的拼音集合
+
+        Returns:
+            各拼音推进结果的并集
+        """
+        if self.fallback or type(pinyins) is not frozenset:
+            nxt = 0
+            for py in pinyins:
+                nxt |= self.advance_char(active, ch_org, py)
+            return nxt
+
+        key = (char_signature(ch_org), pinyins) if self.uses_char_properties else pinyins
+        row = self.token_trans.get(key)
+        if row is None:
+            row = self.token_trans[key] = {}
+        cached = row.get(active)
+        if cached is not None:
+            return cached
+        nxt = 0
+        for py in pinyins:
+            nxt |= self.advance_char(active, ch_org, py)
+        if self._admit(active, nxt):
+            row[active] = nxt
+        return nxt
+
+    def advance_char(self, active: int, ch_org: str, s: str) -> int:
+        """让已闭包的状态位掩码逐字符推进一个拼音字符串（非边界token）
+
+        Args:
+            active: 已闭包的当前状态位掩码
+            ch_org: 原始字符
+            s: 要匹配的字符串
+
+        Returns:
+            推进后的已闭包状态位掩码
+        """
+        nfa = self.nfa
+        if self.fallback:
+            return nfa.advance_char(active, ch_org, s)
+
+        rows = self._rows(char_signature(ch_org) if self.uses_char_properties else 0)
+
+        for ch in s:
+            row = rows.get(active)
+            nxt = row.get(ch) if row is not None else None
+            if nxt is None:
+                nxt = self._add(rows, active, ch, nfa.advance_char(active, ch_org, ch))
+            active = nxt
+            if not active:
+                break
+
+        return active
+
+    def may_match(self, tokens: TokenInput) -> bool:
+        """快速预筛，同 CompiledNFA.may_match"""
+        return self.nfa.may_match(tokens)
+
+    def _specialize_match(self) -> Callable[[Tokens], bool]:
+        """生成针对本模式特化的匹配函数
+
+        与 run_pinyin_regex 的循环相同，但接受/存活/重启掩码和各转换表在生成时绑定到闭包中，
+        每次调用省去类型判断和属性查找，对短文本的重复匹配尤其明显。
+        转换表只会原地清空而不会被替换，因此闭包持有的引用始终有效。
+        用到原始字符属性的模式 token 键还依赖签名，直接使用 run_pinyin_regex。
+
+        Returns:
+            接受结构数组形式 Tokens、返回是否匹配成功的函数
+        """
+        if self.uses_char_properties:
+            return lambda tokens: run_pinyin_regex(self, tokens)
+
+        accept_mask = self.accept_mask
+        live_mask = self.live_mask
+        start_mask = self.start_mask & live_mask
+        restart_mask = 0 if self.anchored else start_mask
+        token_trans = self.token_trans
+        advance_token = self.advance_token
+        advance_boundary = self.advance_boundary
+        boundary_chars = BOUNDARY_CHARS
+
+        def match(tokens: Tokens) -> bool:
+            current = start_mask
+            next_mask: Optional[int]
+            for ch_org, pinyins in zip(tokens.chars, tokens.pinyins):
+                if ch_org in boundary_chars:
+                    next_mask = advance_boundary(current, ch_org)
+                else:
+                    row = token_trans.get(pinyins)
+                    next_mask = row.get(current) if row is not None else None
+                    if next_mask is None:
+                        next_mask = advance_token(current, ch_org, pinyins)
+                if next_mask & accept_mask:
+                    return True
+                current = (next_mask & live_mask) | restart_mask
+                if not current:
+                    return False
+            return bool(current & accept_mask)
+
+        return match
+
+
+def run_pinyin_regex(start_state: Union[State, CompiledNFA, LazyDFA], tokens: TokenInput) -> bool:
+    """运行拼音正则表达式匹配
+
+    Args:
+        start_state: NFA起始状态，或已编译的 CompiledNFA / LazyDFA
+        tokens: 拼音token列表，或结构数组形式的 Tokens
+
+    Returns:
+        是否匹配成功
+    """
+    nfa: Union[CompiledNFA, LazyDFA]
+    if isinstance(start_state, State):
+        nfa = CompiledNFA(start_state)
+    else:
+        nfa = start_state
+
+    accept_mask = nfa.accept_mask
+    advance_token = nfa.advance_token
+    advance_boundary = nfa.advance_boundary
+    # 只保留还能到达接受状态的状态，其余状态之后不可能再匹配
+    live_mask = nfa.live_mask
+    start_mask = nfa.start_mask & live_mask
+    current = start_mask
+    # 锚定在开头的模式只能从首个 <BOS> token 开始匹配，不必重新加入起始闭包
+    restart_mask = 0 if nfa.anchored else start_mask
+
+    # current 始终是闭包后的状态位掩码，推进时无需再次计算闭包
+    pairs: Iterable[Tuple[str, AbstractSet[str]]]
+    if isinstance(tokens, Tokens):
+        pairs = zip(tokens.chars, tokens.pinyins)
+    else:
+        pairs = ((token["char"], token["pinyins"]) for token in tokens)
+
+    # 惰性DFA的token转换表以拼音集合本身为键时，在循环内直接查表，
+    # 命中时省去一次方法调用；Tokens 中的拼音集合都是可哈希的 frozenset
+    token_trans = None
+    if isinstance(nfa, LazyDFA) and not nfa.uses_char_properties and isinstance(tokens, Tokens):
+        token_trans = nfa.token_trans
+
+    next_mask: Optional[int]
+    for ch_org, pinyins in pairs:
+        # 边界token（<BOS>/<EOS>）每个token只判断一次，分派到专门的推进函数
+        if ch_org in BOUNDARY_CHARS:
+            next_mask = advance_boundary(current, ch_org)
+        elif token_trans is not None:
+            row = token_trans.get(pinyins)
+            next_mask = row.get(current) if row is not None else None
+            if next_mask is None:
+                next_mask = advance_token(current, ch_org, pinyins)
+        else:
+            next_mask = advance_token(current, ch_org, pinyins)
+        # ⭐ 如果本 token 内已经到 accept，直接成功
+        if next_mask & accept_mask:
+            return True
 
-        next_states |= start_closure
-        current = next_states
+        current = (next_mask & live_mask) | restart_mask
+        # 没有活跃状态时后续token不可能再匹配
+        if not current:
+            return False
 
-    return any(st.accept for st in current)
+    return bool(current & accept_mask)
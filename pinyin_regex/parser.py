@@ -6,8 +6,11 @@
 
 from typing import Optional, Union, Set
 from .engine import (
+    CompiledNFA,
+    LazyDFA,
     Frag,
     State,
+    finalize_nfa,
     literal_frag,
     concat_frag,
     alt_frag,
@@ -23,17 +26,28 @@ class Parser:
 
     def __init__(self, pattern: str):
         self.p = pattern
+        self.n = len(pattern)
         self.i = 0
 
     def peek(self) -> Optional[str]:
         """查看当前字符"""
-        return self.p[self.i] if self.i < len(self.p) else None
+        i = self.i
+        return self.p[i] if i < self.n else None
 
     def get(self) -> Optional[str]:
         """获取当前字符并前进"""
-        c = self.peek()
-        self.i += 1
-        return c
+        i = self.i
+        self.i = i + 1
+        return self.p[i] if i < self.n else None
+
+    def read_digits(self) -> str:
+        """一次性读取连续的数字字符"""
+        p, i, n = self.p, self.i, self.n
+        j = i
+        while j < n and p[j].isdigit():
+            j += 1
+        self.i = j
+        return p[i:j]
 
     def parse(self) -> Frag:
         """解析正则表达式模式"""
@@ -99,9 +113,7 @@ class Parser:
             self.get()  # 消耗'{'
 
             # 解析 m
-            m_str = ""
-            while (c := self.peek()) is not None and c.isdigit():
-                m_str += self.get()
+            m_str = self.read_digits()
 
             if not m_str:
                 raise SyntaxError("Missing number before comma")
@@ -114,9 +126,7 @@ class Parser:
                 self.get()  # 消耗','
 
                 # 解析 n（可选）
-                n_str = ""
-                while (c := self.peek()) is not None and c.isdigit():
-                    n_str += self.get()
+                n_str = self.read_digits()
 
                 if n_str:
                     max_count = int(n_str)
@@ -182,7 +192,7 @@ class Parser:
     def parse_charclass(self) -> Frag:
         """解析字符类表达式"""
         negate = False
-        chars = set()
+        chars: Set[str] = set()
 
         if self.peek() == "^":
             negate = True
@@ -196,8 +206,7 @@ class Parser:
                 self.get()  # -
                 end = self.get()
                 if c is not None and end is not None:
-                    for code in range(ord(c), ord(end) + 1):
-                        chars.add(chr(code))
+                    chars.update(map(chr, range(ord(c), ord(end) + 1)))
             else:
                 if c is not None:
                     chars.add(c)
@@ -222,4 +231,29 @@ def compile_regex(pattern: str) -> State:
     parser = Parser(pattern)
     frag = parser.parse()
     frag.end.accept = True
+    finalize_nfa(frag.start)
     return frag.start
+
+
+def compile_pattern(pattern: str) -> CompiledNFA:
+    """编译正则表达式模式为扁平化布局的NFA
+
+    Args:
+        pattern: 正则表达式模式字符串
+
+    Returns:
+        CompiledNFA对象，可直接传给 run_pinyin_regex
+    """
+    return CompiledNFA(compile_regex(pattern))
+
+
+def compile_regex_dfa(pattern: str) -> LazyDFA:
+    """把模式编译为惰性DFA
+
+    Args:
+        pattern: 正则表达式模式字符串
+
+    Returns:
+        LazyDFA对象，可直接传给 run_pinyin_regex
+    """
+    return LazyDFA(compile_pattern(pattern))
@@ -5,7 +5,7 @@
 """
 
 from pypinyin import pinyin, Style
-from typing import List, Dict, Set, Any
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Sequence, Tuple, Union
 
 
 # 声母表
@@ -44,26 +44,42 @@ FUZZY_MAP: Dict[str, str] = {
 }
 
 
+# 双字母声母（zh/ch/sh）到自身的映射；其余声母都是单字母
+_TWO_LETTER_INITIALS: Dict[str, str] = {ini: ini for ini in INITIALS if len(ini) == 2}
+
+
 def get_shengmu(py: str) -> str:
     """提取拼音的声母部分
 
+    按前两个字母查双字母声母表，查不到则取首字母。单字母声母与"没有声母时返回首字符"
+    的结果相同，因此无需逐个比较声母表。
+
     Args:
         py: 拼音字符串
 
     Returns:
         声母字符串，如果没有找到则返回原字符
     """
-    for ini in INITIALS:
-        if py.startswith(ini):
-            return ini
-    return py[0] if py else py
+    return _TWO_LETTER_INITIALS.get(py[:2], py[:1])
+
+
+# 拼音扩展表：(use_initials, use_fuzzy) -> {拼音: 扩展集合}，首次遇到时填充
+EXPANSIONS: Dict[Tuple[bool, bool], Dict[str, FrozenSet[str]]] = {
+    (True, True): {},
+    (True, False): {},
+    (False, True): {},
+    (False, False): {},
+}
+
+# 每张扩展表的容量上限
+EXPANSION_TABLE_SIZE = 4096
 
 
-def expand_pinyin(
-    py: str, use_initials: bool = True, use_fuzzy: bool = True
-) -> Set[str]:
+def expand_pinyin(py: str, use_initials: bool = True, use_fuzzy: bool = True) -> FrozenSet[str]:
     """扩展拼音，包含声母和模糊音变体
 
+    结果按选项组合缓存在 EXPANSIONS 中，返回的不可变集合在调用间共享。
+
     Args:
         py: 原始拼音
         use_initials: 是否使用声母索引
@@ -72,30 +88,144 @@ def expand_pinyin(
     Returns:
         扩展后的拼音集合
     """
-    res = {py}
+    table = EXPANSIONS[(bool(use_initials), bool(use_fuzzy))]
+    res = table.get(py)
+    if res is None:
+        res = _compute_expansion(py, use_initials, use_fuzzy)
+        if len(table) < EXPANSION_TABLE_SIZE:
+            table[py] = res
+    return res
+
 
+def _compute_expansion(py: str, use_initials: bool, use_fuzzy: bool) -> FrozenSet[str]:
+    """计算拼音扩展集合
+
+    扩展至多包含全拼、声母以及二者的模糊音四项，直接由元组构造不可变集合，
+    不经过中间的可变集合。
+    """
     sm = get_shengmu(py)
+    fuzzy_sm = FUZZY_MAP.get(sm) if use_fuzzy else None
 
-    # 声母索引
+    if fuzzy_sm is None:
+        # 声母索引
+        return frozenset((py, sm)) if use_initials else frozenset((py,))
+    # 模糊音：zong、z
     if use_initials:
-        res.add(sm)
+        return frozenset((py, sm, fuzzy_sm + py[len(sm) :], fuzzy_sm))
+    return frozenset((py, fuzzy_sm + py[len(sm) :], fuzzy_sm))
 
-    # 模糊音
-    if use_fuzzy and sm in FUZZY_MAP:
-        fuzzy_sm = FUZZY_MAP[sm]
-        res.add(fuzzy_sm + py[len(sm) :])  # zong
-        res.add(fuzzy_sm)  # z
 
-    return res
+# 单字拼音集合表：(use_initials, use_fuzzy) -> {字符: 该字符token的拼音集合}，首次遇到时填充
+CHAR_PINYINS: Dict[Tuple[bool, bool], Dict[str, FrozenSet[str]]] = {
+    (True, True): {},
+    (True, False): {},
+    (False, True): {},
+    (False, False): {},
+}
 
+# 每张单字拼音集合表的容量上限，足以容纳常用汉字
+CHAR_TABLE_SIZE = 65536
 
-def text_to_tokens(
+# ASCII 字符没有汉字读音，pypinyin 原样返回字符本身，其扩展也只有字符本身，
+# 与选项无关；首次遇到时直接取这里的集合，不必调用 pypinyin
+_ASCII_PINYINS: Dict[str, FrozenSet[str]] = {chr(cp): frozenset({chr(cp)}) for cp in range(128)}
+
+
+def char_pinyins(
+    chars: Sequence[str], use_initials: bool = True, use_fuzzy: bool = True
+) -> List[FrozenSet[str]]:
+    """查询每个字符对应token的拼音集合
+
+    集合包含字符所有读音的扩展以及字符本身，按选项组合缓存在 CHAR_PINYINS 中。
+    表中没有的非 ASCII 字符合并为一次 pypinyin 调用，之后同一字符只需一次字典查找。
+
+    Args:
+        chars: 字符序列（字符列表或字符串）
+        use_initials: 是否启用声母索引
+        use_fuzzy: 是否启用模糊音
+
+    Returns:
+        与 chars 一一对应的拼音集合列表
+    """
+    table = CHAR_PINYINS[(bool(use_initials), bool(use_fuzzy))]
+    try:
+        # 常见情况下字符都已在表中，map 在C层逐字查表，不必先去重检查缺失字符
+        return list(map(table.__getitem__, chars))
+    except KeyError:
+        pass
+    missing = [ch for ch in dict.fromkeys(chars) if ch not in table]
+
+    extra = {}
+    han = []
+    for ch in missing:
+        pys = _ASCII_PINYINS.get(ch)
+        if pys is None:
+            han.append(ch)
+        else:
+            extra[ch] = pys
+    if han:
+        extra.update(zip(han, _compute_char_pinyins(han, use_initials, use_fuzzy)))
+    for ch, pys in extra.items():
+        if len(table) < CHAR_TABLE_SIZE:
+            table[ch] = pys
+    return [extra[ch] if ch in extra else table[ch] for ch in chars]
+
+
+# 中日韩统一表意文字基本区，覆盖常用汉字
+CJK_UNIFIED_RANGE = (0x4E00, 0x9FFF)
+
+
+def preload_char_pinyins(use_initials: bool = True, use_fuzzy: bool = True) -> int:
+    """预先填充常用汉字的单字拼音集合表
+
+    默认按需填充；长期运行的服务可在启动时调用一次，
+    把首次遇到每个汉字时的 pypinyin 查询挪到启动阶段（约两万字，耗时约0.2秒）。
+
+    Args:
+        use_initials: 是否启用声母索引
+        use_fuzzy: 是否启用模糊音
+
+    Returns:
+        填充后表中的字符数
+    """
+    first, last = CJK_UNIFIED_RANGE
+    char_pinyins([chr(cp) for cp in range(first, last + 1)], use_initials, use_fuzzy)
+    return len(CHAR_PINYINS[(bool(use_initials), bool(use_fuzzy))])
+
+
+def _compute_char_pinyins(
+    chars: Union[List[str], str], use_initials: bool, use_fuzzy: bool
+) -> List[FrozenSet[str]]:
+    """计算字符的拼音集合（不查缓存）"""
+    pys = pinyin(chars, style=Style.NORMAL, heteronym=True)
+    return [
+        frozenset().union(*(expand_pinyin(py, use_initials, use_fuzzy) for py in py_list), ch)
+        for ch, py_list in zip(chars, pys)
+    ]
+
+
+class Tokens(NamedTuple):
+    """结构数组（SoA）形式的token序列
+
+    chars[i] 和 pinyins[i] 分别是第 i 个token的原始字符和拼音集合，
+    匹配时按下标并行访问，省去每个token一个字典的构造和键查找。
+    """
+
+    chars: Tuple[str, ...]
+    pinyins: Tuple[FrozenSet[str], ...]
+
+
+_BOS_PINYINS = frozenset({"<BOS>"})
+_EOS_PINYINS = frozenset({"<EOS>"})
+
+
+def text_to_token_arrays(
     text: str,
     use_initials: bool = True,
     use_fuzzy: bool = True,
     split_chars: bool = True,
-) -> List[Dict[str, Any]]:
-    """将文本转换为拼音token列表
+) -> Tokens:
+    """将文本转换为结构数组形式的拼音token序列
 
     Args:
         text: 输入文本
@@ -104,27 +234,50 @@ def text_to_tokens(
         split_chars: 是否按字符分割
 
     Returns:
-        包含字符和对应拼音集合的token列表
+        Tokens，首尾分别为 <BOS> 和 <EOS> 边界token
     """
-    tokens = []
-    
-    # 添加开始边界符号
-    tokens.append({"char": "<BOS>", "pinyins": {"<BOS>"}})
-    
     if split_chars and isinstance(text, str):
-        text = list(text)
+        # 按字符分割时每个token只取决于字符本身，直接查单字拼音集合表
+        token_pinyins = char_pinyins(text, use_initials, use_fuzzy)
+    else:
+        # 不分割时 pypinyin 按词组返回读音，token按组数截取
+        token_pinyins = _compute_char_pinyins(text, use_initials, use_fuzzy)
+        text = text[: len(token_pinyins)]
+
+    # 首尾添加边界符号
+    chars = ("<BOS>", *text, "<EOS>")
+    pinyins = (_BOS_PINYINS, *token_pinyins, _EOS_PINYINS)
 
-    pys = pinyin(text, style=Style.NORMAL, heteronym=True)
+    return Tokens(chars, pinyins)
 
-    for ch, py_list in zip(text, pys):
-        base = set()
-        for py in py_list:
-            base |= expand_pinyin(py, use_initials, use_fuzzy)
-        base |= set(ch)
 
-        tokens.append({"char": ch, "pinyins": base})
-    
-    # 添加结束边界符号
-    tokens.append({"char": "<EOS>", "pinyins": {"<EOS>"}})
+def tokens_to_dicts(tokens: Tokens) -> List[Dict[str, Any]]:
+    """把结构数组形式的token转换为字典列表
 
-    return tokens
+    Args:
+        tokens: 结构数组形式的token序列
+
+    Returns:
+        每个token为 {"char": 字符, "pinyins": 拼音集合} 的列表
+    """
+    return [{"char": ch, "pinyins": pys} for ch, pys in zip(tokens.chars, tokens.pinyins)]
+
+
+def text_to_tokens(
+    text: str,
+    use_initials: bool = True,
+    use_fuzzy: bool = True,
+    split_chars: bool = True,
+) -> List[Dict[str, Any]]:
+    """将文本转换为拼音token列表
+
+    Args:
+        text: 输入文本
+        use_initials: 是否启用声母索引
+        use_fuzzy: 是否启用模糊音
+        split_chars: 是否按字符分割
+
+    Returns:
+        包含字符和对应拼音集合（不可变集合）的token列表
+    """
+    return tokens_to_dicts(text_to_token_arrays(text, use_initials, use_fuzzy, split_chars))
@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pinyin_regex import compile_regex, pinyin_regex_match
 from pinyin_regex.debug import (
     dump_nfa,
+    count_states,
     visualize_nfa,
     debug_pattern,
     NFAVisualizer,
@@ -48,6 +49,15 @@ class TestDebugModule(unittest.TestCase):
         self.assertIn("ε", output)
         self.assertIn("->", output)
 
+    def test_count_states(self):
+        """测试状态数与编译后的扁平NFA一致"""
+        from pinyin_regex import CompiledNFA
+
+        for pattern in ["yinyue", "a(b|c)*", "y{1,3}in"]:
+            with self.subTest(pattern=pattern):
+                start = compile_regex(pattern)
+                self.assertEqual(count_states(start), CompiledNFA(start).n_states)
+
     def test_visualize_nfa_dot_format(self):
         """测试NFA DOT格式输出"""
         # 测试DOT格式输出到文件
@@ -104,6 +114,26 @@ class TestDebugModule(unittest.TestCase):
             # graphviz渲染失败不应该导致测试失败
             self.skipTest(f"graphviz rendering failed: {e}")
 
+    @unittest.skipUnless(GRAPHVIZ_AVAILABLE, "graphviz not available")
+    def test_graphviz_renders_all_states(self):
+        """测试graphviz渲染包含所有可达状态，而不只是起始状态"""
+        output_file = "test_nfa_render.gv"
+        start_state = compile_regex("a(b|c)*")
+
+        try:
+            result = render_nfa_graph(start_state, output_file, "gv")
+            if not result:
+                self.skipTest("graphviz rendering failed")
+            with open(result, "r", encoding="utf-8") as f:
+                content = f.read()
+            os.remove(result)
+        except Exception as e:
+            self.skipTest(f"graphviz rendering failed: {e}")
+
+        self.assertIn('label="b"', content)
+        self.assertIn('label="c"', content)
+        self.assertEqual(content.count("doublecircle"), 1)
+
     def test_debug_pattern_basic(self):
         """测试基础调试模式"""
         debug_info = debug_pattern(self.pattern, self.text)
@@ -168,6 +198,32 @@ class TestDebugModule(unittest.TestCase):
         self.assertIn("matching", profiler.timings)
         self.assertEqual(len(profiler.timings["matching"]), 1)
 
+    def test_performance_profiler_run(self):
+        """测试性能分析器对已编译NFA的运行计时"""
+        profiler = PerformanceProfiler()
+
+        duration = profiler.profile_run(self.start_state, self.text)
+
+        self.assertIsInstance(duration, float)
+        self.assertGreaterEqual(duration, 0)
+        self.assertEqual(len(profiler.timings["run"]), 1)
+        self.assertNotIn("compilation", profiler.timings)
+
+    def test_performance_profiler_reuse_compiled(self):
+        """测试复用编译结果的匹配性能分析"""
+        profiler = PerformanceProfiler(reuse_compiled=True)
+
+        for pattern in ["YinYue", "yinyue", "yinyue"]:
+            duration = profiler.profile_matching(pattern, self.text)
+            self.assertIsInstance(duration, float)
+            self.assertGreaterEqual(duration, 0)
+        profiler.profile_matching("yinyue", self.text, use_fuzzy=False)
+
+        self.assertEqual(len(profiler.timings["matching"]), 4)
+        info = profiler._compiled.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 3))
+        self.assertNotIn("compilation", profiler.timings)
+
     def test_performance_profiler_summary(self):
         """测试性能分析器摘要功能"""
         profiler = PerformanceProfiler()
@@ -218,6 +274,19 @@ class TestDebugModule(unittest.TestCase):
         self.assertIn("label", dot_content)
         self.assertIn(";", dot_content)
 
+    def test_nfa_visualizer_generate_dot_edges(self):
+        """测试DOT输出包含所有转换且标签中的引号被转义"""
+        visualizer = NFAVisualizer()
+        start_state = compile_regex('a"b*')
+
+        dot_content = visualizer.generate_dot(start_state)
+
+        self.assertIn('[label="\\""]', dot_content)
+        self.assertEqual(dot_content.count("[shape=doublecircle]"), 1)
+        self.assertTrue(dot_content.endswith("}"))
+        self.assertIn('[label="a"]', dot_content)
+        self.assertIn('[label="b"]', dot_content)
+
     def test_multiple_patterns_debug(self):
         """测试多种模式的调试功能"""
         test_cases = [
@@ -256,6 +325,32 @@ class TestDebugModule(unittest.TestCase):
         self.assertIsInstance(time1, float)
         self.assertIsInstance(time2, float)
 
+    def test_perf_counter_ns(self):
+        """测试纳秒计数器及计时记录为整数纳秒"""
+        profiler = PerformanceProfiler()
+
+        time1 = profiler.perf_counter_ns()
+        time2 = profiler.perf_counter_ns()
+        self.assertIsInstance(time1, int)
+        self.assertGreaterEqual(time2, time1)
+
+        duration = profiler.profile_compilation(self.pattern)
+        recorded = profiler.timings["compilation"][0]
+        self.assertIsInstance(recorded, int)
+        self.assertAlmostEqual(duration, recorded / 1e9)
+
+    def test_performance_profiler_summary_values(self):
+        """测试摘要统计值与记录的纳秒耗时一致"""
+        profiler = PerformanceProfiler()
+        profiler.timings["run"].extend([1000, 2000, 6000])
+
+        stats = profiler.get_summary()["run"]
+        self.assertEqual(stats["count"], 3)
+        self.assertAlmostEqual(stats["total"], 9000 / 1e9)
+        self.assertAlmostEqual(stats["average"], 3000 / 1e9)
+        self.assertAlmostEqual(stats["min"], 1000 / 1e9)
+        self.assertAlmostEqual(stats["max"], 6000 / 1e9)
+
     def test_debug_pattern_bug_fix(self):
         """测试TODO中提到的debug_pattern bug修复
 
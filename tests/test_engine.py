@@ -12,6 +12,7 @@
 """
 
 import unittest
+from unittest import mock
 import sys
 import time
 from typing import List, Tuple, Any
@@ -19,13 +20,39 @@ from typing import List, Tuple, Any
 # 导入被测试的模块
 from pinyin_regex import (
     pinyin_regex_match,
+    pinyin_regex_match_many,
+    match_compiled,
     text_to_tokens,
+    text_to_token_arrays,
+    tokens_to_dicts,
+    Tokens,
+    preload_char_pinyins,
     compile_regex,
+    compile_pattern,
+    run_pinyin_regex,
+    CompiledNFA,
+    LazyDFA,
+    compile_regex_dfa,
     expand_pinyin,
     get_shengmu,
     INITIALS,
     FUZZY_MAP,
+    clear_cache,
+    epsilon_closure,
+    State,
 )
+from pinyin_regex.engine import (
+    advance_states,
+    advance_states_boundary,
+    advance_states_char,
+    char_signature,
+    compile_matcher,
+    finalize_nfa,
+    intern_label,
+    match_label,
+)
+from pinyin_regex import _compile_cached, _tokens_cached, _tokens_default
+from pinyin_regex.debug import NS_PER_SECOND
 
 
 class TestPinyinRegexBasic(unittest.TestCase):
@@ -183,6 +210,52 @@ class TestPinyinRegexFeatures(unittest.TestCase):
                 self.assertEqual(result, expected)
 
 
+class TestBatchMatching(unittest.TestCase):
+    """批量匹配测试"""
+
+    PATTERNS = ("yinyue", "yin(yue|le){2}", "yy", "cq", "^bei", r"\d+")
+
+    @classmethod
+    def setUpClass(cls):
+        # 整个测试类共用一次编译的结果
+        cls.compiled = {pattern: compile_regex_dfa(pattern) for pattern in cls.PATTERNS}
+
+    def test_match_compiled(self):
+        """测试用预编译的模式匹配与 pinyin_regex_match 一致"""
+        texts = ["音乐", "音乐了", "背景音乐", "重庆", "北京", "a12", ""]
+        for pattern, compiled in self.compiled.items():
+            for text in texts:
+                for options in ({}, {"use_initials": False}, {"split_chars": False}):
+                    with self.subTest(pattern=pattern, text=text, options=options):
+                        self.assertEqual(
+                            match_compiled(compiled, text, **options),
+                            pinyin_regex_match(pattern, text, **options),
+                        )
+
+    def test_match_many(self):
+        """测试同一模式批量匹配多个文本"""
+        texts = ["音乐", "背景音乐", "舞蹈", ""]
+        results = pinyin_regex_match_many("yinyue", texts)
+        self.assertEqual(results, [True, True, False, False])
+
+    def test_match_many_consistent_with_single(self):
+        """测试批量匹配与单次匹配结果一致"""
+        texts = ["音乐", "音乐了", "北京", "重庆"]
+        patterns = ["yin(yue|le){2}", "yy", "cq", "zong"]
+
+        for pattern in patterns:
+            for options in ({}, {"use_initials": False}, {"use_fuzzy": False}):
+                with self.subTest(pattern=pattern, options=options):
+                    expected = [pinyin_regex_match(pattern, t, **options) for t in texts]
+                    self.assertEqual(pinyin_regex_match_many(pattern, texts, **options), expected)
+
+    def test_match_many_repeated_texts(self):
+        """测试批量中重复文本的结果与位置一一对应"""
+        texts = ["音乐", "舞蹈"] * 50 + ["背景音乐"]
+        results = pinyin_regex_match_many("yinyue", iter(texts))
+        self.assertEqual(results, [True, False] * 50 + [True])
+
+
 class TestRangeQuantifiers(unittest.TestCase):
     """测试 {m,n} 量词功能"""
 
@@ -242,6 +315,14 @@ class TestRangeQuantifiers(unittest.TestCase):
                 result = pinyin_regex_match(pattern, text)
                 self.assertEqual(result, expected)
 
+    def test_large_exact_count(self):
+        """测试大次数精确重复的状态数随次数线性增长"""
+        sizes = [compile_pattern(f"(ab){{{n}}}").n_states for n in (16, 32, 64)]
+        self.assertEqual(sizes[2] - sizes[1], 2 * (sizes[1] - sizes[0]))
+
+        self.assertTrue(pinyin_regex_match("^(ab){64}$", "ab" * 64))
+        self.assertFalse(pinyin_regex_match("^(ab){64}$", "ab" * 63))
+
 
 class TestPinyinUtils(unittest.TestCase):
     """拼音工具函数测试"""
@@ -255,6 +336,10 @@ class TestPinyinUtils(unittest.TestCase):
             ("bei", "b"),
             ("a", "a"),
             ("", ""),
+            ("zi", "z"),
+            ("z", "z"),
+            ("er", "e"),
+            ("音", "音"),
         ]
 
         for pinyin, expected in test_cases:
@@ -262,6 +347,18 @@ class TestPinyinUtils(unittest.TestCase):
                 result = get_shengmu(pinyin)
                 self.assertEqual(result, expected)
 
+    def test_expansion_table(self):
+        """测试扩展结果按选项缓存，返回共享的不可变集合"""
+        from pinyin_regex import pinyin_utils
+
+        for use_initials in (True, False):
+            for use_fuzzy in (True, False):
+                with self.subTest(use_initials=use_initials, use_fuzzy=use_fuzzy):
+                    expanded = expand_pinyin("zhong", use_initials, use_fuzzy)
+                    self.assertIsInstance(expanded, frozenset)
+                    self.assertIs(pinyin_utils.EXPANSIONS[(use_initials, use_fuzzy)]["zhong"], expanded)
+                    self.assertIs(expand_pinyin("zhong", use_initials, use_fuzzy), expanded)
+
     def test_expand_pinyin(self):
         """测试拼音扩展"""
         # 测试基本扩展
@@ -304,6 +401,69 @@ class TestPinyinUtils(unittest.TestCase):
         self.assertEqual(tokens[3]["char"], "<EOS>")
         self.assertIn("<EOS>", tokens[3]["pinyins"])
 
+    def test_text_to_token_arrays(self):
+        """测试结构数组形式的token与字典形式一致"""
+        for text in ["音乐", "hello 世界", ""]:
+            with self.subTest(text=text):
+                arrays = text_to_token_arrays(text)
+                self.assertIsInstance(arrays, Tokens)
+                self.assertEqual(len(arrays.chars), len(arrays.pinyins))
+                self.assertEqual(tokens_to_dicts(arrays), text_to_tokens(text))
+
+        arrays = text_to_token_arrays("音乐")
+        self.assertEqual(arrays.chars, ("<BOS>", "音", "乐", "<EOS>"))
+        self.assertIn("yue", arrays.pinyins[2])
+
+    def test_char_pinyins_table(self):
+        """测试单字拼音集合按字符缓存，且与逐字计算一致"""
+        from pinyin_regex.pinyin_utils import CHAR_PINYINS, char_pinyins
+
+        table = CHAR_PINYINS[(True, False)]
+        # 临时清空全局表，退出时恢复原内容，不影响其他测试
+        with mock.patch.dict(table, clear=True):
+            result = char_pinyins(list("乐乐a"), use_initials=True, use_fuzzy=False)
+            self.assertEqual(set(table), {"乐", "a"})
+            self.assertIs(result[0], result[1])
+            self.assertEqual(result[0], frozenset({"yue", "le", "y", "l", "乐"}))
+            self.assertEqual(result[2], frozenset({"a"}))
+            # 再次查询直接复用表中的集合
+            self.assertIs(char_pinyins(["乐"], use_initials=True, use_fuzzy=False)[0], result[0])
+            # 部分字符不在表中时只补算缺失的字符
+            mixed = char_pinyins("b乐", use_initials=True, use_fuzzy=False)
+            self.assertEqual(mixed, [frozenset({"b"}), result[0]])
+            self.assertIs(mixed[1], result[0])
+
+    def test_ascii_char_pinyins(self):
+        """测试ASCII字符不经 pypinyin 的拼音集合与逐字计算一致"""
+        from pinyin_regex.pinyin_utils import CHAR_PINYINS, _compute_char_pinyins, char_pinyins
+
+        chars = [chr(cp) for cp in range(128)]
+        for options in [(True, True), (True, False), (False, True), (False, False)]:
+            with self.subTest(options=options), mock.patch.dict(CHAR_PINYINS[options], clear=True):
+                self.assertEqual(char_pinyins(chars, *options), _compute_char_pinyins(chars, *options))
+
+    def test_preload_char_pinyins(self):
+        """测试预先填充常用汉字的拼音集合表"""
+        from pinyin_regex.pinyin_utils import CHAR_PINYINS, char_pinyins
+
+        size = preload_char_pinyins(use_initials=False, use_fuzzy=False)
+        table = CHAR_PINYINS[(False, False)]
+        self.assertEqual(size, len(table))
+        self.assertGreaterEqual(size, 0x9FFF - 0x4E00 + 1)
+        self.assertEqual(table["乐"], frozenset({"yue", "le", "乐"}))
+        self.assertIs(char_pinyins(["乐"], use_initials=False, use_fuzzy=False)[0], table["乐"])
+
+    def test_run_with_token_arrays(self):
+        """测试run_pinyin_regex对两种token形式结果一致"""
+        cases = [("yinyue", "音乐"), ("^yy$", "音乐"), ("y.+e", "音乐"), ("xyz", "音乐"), ("\\d+", "a12")]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern, text=text):
+                nfa = compile_pattern(pattern)
+                arrays = text_to_token_arrays(text)
+                dicts = text_to_tokens(text)
+                self.assertEqual(run_pinyin_regex(nfa, arrays), run_pinyin_regex(nfa, dicts))
+                self.assertEqual(nfa.may_match(arrays), nfa.may_match(dicts))
+
 
 class TestEdgeCases(unittest.TestCase):
     """边界情况测试"""
@@ -318,6 +478,28 @@ class TestEdgeCases(unittest.TestCase):
         result = pinyin_regex_match("yinyue", "")
         self.assertFalse(result)
 
+    def test_ascii_text_matches_engine(self):
+        """测试纯ASCII文本走标准库正则时与NFA结果一致"""
+        from pinyin_regex import _plain_regex_cached
+
+        patterns = ["abc", "a(b|c)d", "x.+", "(ab)c?", "a1|b2", "", "(|a)b", "ABC"]
+        texts = ["abc", "xabcdx", "x\ny", "acbd", "c", "b2", "ABC", "", "a b c"]
+        for pattern in patterns:
+            self.assertIsNotNone(_plain_regex_cached(pattern.lower()))
+            nfa = compile_pattern(pattern.lower())
+            for text in texts:
+                with self.subTest(pattern=pattern, text=text):
+                    expected = run_pinyin_regex(nfa, text_to_token_arrays(text))
+                    self.assertEqual(pinyin_regex_match(pattern, text), expected)
+
+        # 与标准库语义不同的语法，以及会让回溯引擎退化的量词，仍由NFA处理
+        for pattern in [
+            "^a", "a$", "[ab]", "a{2}", r"\d", "a*?", "a+?", "(?:a)", "a)",
+            "(a|aa)*c", "(a*)*b", "(a+)+b", "a*a*b", "(ab)?c", ".*x", "a.*x", "x.+y",
+        ]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNone(_plain_regex_cached(pattern))
+
     def test_substring_matching(self):
         """测试子串匹配"""
         test_cases = [
@@ -345,31 +527,662 @@ class TestEdgeCases(unittest.TestCase):
                 self.assertEqual(result, expected)
 
 
+# 嵌套量词、后面还有模式的无界量词等会让回溯引擎退化为指数或平方时间的模式
+PATHOLOGICAL_PATTERNS = ("(a*)*b", "(a|aa)*c", "(a|a)*b", "(.*)*x", "(a+)+b", ".*x", "a.*x")
+
+# 大文本性能测试使用的文本，模块级创建一次
+LARGE_TEXT = "音乐" * 1000
+
+# 纯ASCII大文本，用于覆盖交给标准库正则的快速路径；平方时间在此长度下需要数秒
+ASCII_LARGE_TEXT = "a" * 100000
+
+
 class TestPerformance(unittest.TestCase):
-    """性能测试"""
+    """性能测试
+
+    计时使用 perf_counter_ns，以整数纳秒比较，分辨率不受系统时钟影响。
+    """
 
     def test_large_text_performance(self):
-        """测试大文本性能"""
-        # 创建包含大量中文的文本
-        large_text = "音乐" * 1000
-        start_time = time.time()
-        result = pinyin_regex_match("yinyue", large_text)
-        end_time = time.time()
+        """测试大文本性能
 
-        self.assertTrue(result)
-        # 性能要求：处理1000个字符应该在1秒内完成
-        self.assertLess(end_time - start_time, 1.0)
+        模式编译和文本token化都在计时区间外完成，区间内重复匹配取平均，只衡量匹配本身。
+        """
+        compiled = compile_regex_dfa("yinyue")
+        self.assertTrue(match_compiled(compiled, LARGE_TEXT))
+        tokens = text_to_token_arrays(LARGE_TEXT)
+        match = compiled.match
+
+        runs = 100
+        start_time = time.perf_counter_ns()
+        for _ in range(runs):
+            match(tokens)
+        per_match = (time.perf_counter_ns() - start_time) // runs
+
+        # 性能要求：处理2000个字符的单次匹配应该在10毫秒内完成
+        self.assertLess(per_match, NS_PER_SECOND // 100)
 
     def test_complex_pattern_performance(self):
         """测试复杂模式性能"""
         complex_pattern = r"(yin|zhong|chang|bei|shang)[a-z]*"
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         result = pinyin_regex_match(complex_pattern, "音乐中国长江北京上海")
-        end_time = time.time()
+        end_time = time.perf_counter_ns()
 
         self.assertTrue(result)
         # 复杂模式应该在合理时间内完成
-        self.assertLess(end_time - start_time, 2.0)
+        self.assertLess(end_time - start_time, 2 * NS_PER_SECOND)
+
+    def test_pathological_patterns_linear(self):
+        """测试嵌套量词等回溯引擎会退化的模式仍在线性时间内完成"""
+        text = "a" * 2000
+        tokens = text_to_token_arrays(text)
+        for pattern in PATHOLOGICAL_PATTERNS:
+            with self.subTest(pattern=pattern):
+                nfa = compile_pattern(pattern)
+                start_time = time.perf_counter_ns()
+                self.assertFalse(pinyin_regex_match(pattern, text))
+                self.assertFalse(run_pinyin_regex(nfa, tokens))
+                self.assertLess(time.perf_counter_ns() - start_time, NS_PER_SECOND)
+
+    def test_pathological_patterns_ascii_text(self):
+        """测试纯ASCII大文本上病态模式的匹配仍为线性时间
+
+        纯ASCII文本可能交给标准库正则处理，这里确认该路径不会退化。
+        """
+        # 先完成token化，计时区间只包含匹配
+        pinyin_regex_match("b", ASCII_LARGE_TEXT)
+        for pattern in PATHOLOGICAL_PATTERNS:
+            with self.subTest(pattern=pattern):
+                start_time = time.perf_counter_ns()
+                self.assertFalse(pinyin_regex_match(pattern, ASCII_LARGE_TEXT))
+                self.assertLess(time.perf_counter_ns() - start_time, NS_PER_SECOND)
+
+
+class TestStateNFA(unittest.TestCase):
+    """基于 State 对象的NFA测试"""
+
+    def _reachable(self, start):
+        states, stack = {start}, [start]
+        while stack:
+            s = stack.pop()
+            for t in list(s.eps) + [t for ts in s.trans.values() for t in ts]:
+                if t not in states:
+                    states.add(t)
+                    stack.append(t)
+        return states
+
+    def _walk_closure(self, states):
+        res, stack = set(states), list(states)
+        while stack:
+            for e in stack.pop().eps:
+                if e not in res:
+                    res.add(e)
+                    stack.append(e)
+        return res
+
+    def test_precomputed_closures(self):
+        """测试编译后每个状态都带有预计算的epsilon闭包和转换元组"""
+        start = compile_regex("(a*b|c)+d?")
+        for st in self._reachable(start):
+            self.assertIsInstance(st.eclosure, frozenset)
+            self.assertEqual(st.eclosure, self._walk_closure({st}))
+            self.assertEqual(
+                [(label, targets) for label, targets, _ in st.trans_items], list(st.trans.items())
+            )
+        self.assertEqual(epsilon_closure({start}), self._walk_closure({start}))
+
+    def test_advance_with_closure_cache(self):
+        """测试带闭包缓存的推进结果与不带缓存一致，且重复状态集合命中缓存"""
+        start = compile_regex("(yin|yue)+le")
+        cache = {}
+        tokens = text_to_tokens("音乐乐")
+        current = {start}
+        for tok in tokens:
+            for py in tok["pinyins"]:
+                with self.subTest(char=tok["char"], py=py):
+                    self.assertEqual(
+                        set(advance_states(current, tok["char"], py, cache)),
+                        set(advance_states(current, tok["char"], py)),
+                    )
+        self.assertIn(frozenset({start}), cache)
+        n_cached = len(cache)
+        advance_states(current, "音", "yin", cache)
+        self.assertEqual(len(cache), n_cached)
+
+    def test_compiled_matchers(self):
+        """测试编译后的标签匹配函数与 match_label 结果一致"""
+        labels = [
+            ".", "<BOS>", "<EOS>", r"\d", r"\w", r"\s", r"\z", r"\x", "\\", "a",
+            frozenset("abc"), ("NEG", frozenset("abc")),
+        ]
+        inputs = [("<BOS>", "<BOS>"), ("<EOS>", "<EOS>"), ("音", "y"), ("音", "音"), ("1", "1"),
+                  ("a", "a"), (" ", " "), ("b", "b"), ("x", "\\"), ("Ａ", "Ａ"),
+                  ("١", "١"), ("\u3000", " "), ("\u4e00", "y"), ("\u9fff", "y"), ("\ua000", "y"),
+                  ("ab", "a"), ("音乐", "y"), ("é", "e")]
+        for label in labels:
+            matcher = compile_matcher(label)
+            for ch_org, ch in inputs:
+                with self.subTest(label=label, ch_org=ch_org, ch=ch):
+                    self.assertEqual(matcher(ch_org, ch), match_label(label, ch_org, ch))
+
+    def test_clone_frag(self):
+        """测试片段复制生成独立且结构相同的状态图"""
+        from pinyin_regex.engine import clone_frag
+        from pinyin_regex.parser import Parser
+
+        frag = Parser("a(b|c)*").parse()
+        copy = clone_frag(frag)
+        original_states = self._reachable(frag.start)
+        copied_states = self._reachable(copy.start)
+        self.assertEqual(len(copied_states), len(original_states))
+        self.assertTrue(original_states.isdisjoint(copied_states))
+        self.assertIn(copy.end, copied_states)
+
+        copy.end.accept = True
+        finalize_nfa(copy.start)
+        self.assertTrue(run_pinyin_regex(copy.start, text_to_tokens("abcb")))
+        self.assertFalse(frag.end.accept)
+
+    def test_split_advance(self):
+        """测试边界推进和字符推进与统一入口结果一致"""
+        start = compile_regex("^yin$")
+        current = epsilon_closure({start})
+        after_bos = advance_states_boundary(current, "<BOS>")
+        self.assertEqual(set(after_bos), set(advance_states(current, "<BOS>", "<BOS>")))
+        after_yin = advance_states_char(after_bos, "音", "yin")
+        self.assertEqual(set(after_yin), set(advance_states(after_bos, "音", "yin")))
+        after_eos = advance_states_boundary(after_yin, "<EOS>")
+        self.assertTrue(any(s.accept for s in after_eos))
+        # 没有边界转换时状态保持不变
+        self.assertEqual(set(advance_states_boundary(after_bos, "<BOS>")), set(after_bos))
+
+        nfa = compile_pattern("^yin$")
+        mask = nfa.advance_boundary(nfa.start_mask, "<BOS>")
+        self.assertEqual(mask, nfa.advance(nfa.start_mask, "<BOS>", "<BOS>"))
+        mask = nfa.advance_char(mask, "音", "yin")
+        self.assertTrue(nfa.advance_boundary(mask, "<EOS>") & nfa.accept_mask)
+
+    def test_closure_without_precompute(self):
+        """测试未预计算闭包的状态仍按epsilon边遍历"""
+        s1, s2, s3 = State(), State(), State()
+        s1.eps.add(s2)
+        s2.eps.add(s3)
+        self.assertEqual(epsilon_closure({s1}), {s1, s2, s3})
+
+    def test_shared_label_objects(self):
+        """测试相同的字符类标签在不同片段间共享同一对象"""
+        start = compile_regex("[a-z]x[a-z]")
+        labels = [
+            label
+            for s in self._reachable(start)
+            for label in s.trans
+            if isinstance(label, frozenset)
+        ]
+        self.assertEqual(len(labels), 2)
+        self.assertIs(labels[0], labels[1])
+        self.assertIs(intern_label(frozenset("abc")), intern_label(frozenset("cba")))
+
+
+class TestCompiledNFA(unittest.TestCase):
+    """扁平化NFA测试"""
+
+    def test_layout(self):
+        """测试状态编号和CSR布局"""
+        nfa = compile_pattern("yin(yue|le)+")
+        self.assertEqual(len(nfa.eps_indptr), nfa.n_states + 1)
+        self.assertEqual(len(nfa.trans_indptr), nfa.n_states + 1)
+        self.assertEqual(nfa.eps_indptr[-1], len(nfa.eps_indices))
+        self.assertEqual(nfa.trans_indptr[-1], len(nfa.trans_labels))
+        self.assertEqual(len(nfa.trans_labels), len(nfa.trans_targets))
+        self.assertEqual(sum(nfa.accept), 1)
+        # 起始状态编号为0，第一条字符转换是 y
+        self.assertEqual(nfa.labels[nfa.trans_labels[nfa.trans_indptr[0]]], "y")
+
+    def test_sorted_transitions(self):
+        """测试每个状态的转换按标签编号排序并可按标签查找"""
+        nfa = compile_pattern("(yin|yue|le|bei|jing|zhong|chang|qing|a)+")
+        for i in range(nfa.n_states):
+            lo, hi = nfa.trans_indptr[i], nfa.trans_indptr[i + 1]
+            row = nfa.trans_labels[lo:hi]
+            with self.subTest(state=i):
+                self.assertEqual(list(row), sorted(row))
+                for label_id in set(row):
+                    expected = tuple(
+                        nfa.trans_targets[k] for k in range(lo, hi) if nfa.trans_labels[k] == label_id
+                    )
+                    self.assertEqual(nfa.transitions(i, label_id), expected)
+        self.assertEqual(nfa.transitions(0, len(nfa.labels)), ())
+
+    def test_bitmask_state_sets(self):
+        """测试状态集合位掩码"""
+        nfa = compile_pattern("a*b")
+        self.assertEqual(len(nfa.closure_masks), nfa.n_states)
+        for i, mask in enumerate(nfa.closure_masks):
+            with self.subTest(state=i):
+                # 每个状态的闭包都包含自身
+                self.assertTrue(mask >> i & 1)
+        self.assertEqual(nfa.start_mask, nfa.closure_masks[0])
+        # 构造完成后各表冻结为元组
+        for table in (nfa.accept, nfa.eps_indices, nfa.trans_labels, nfa.closure_masks, nfa.step_masks):
+            self.assertIsInstance(table, tuple)
+        self.assertEqual(bin(nfa.accept_mask).count("1"), 1)
+        self.assertEqual(nfa.closure(0), 0)
+        self.assertEqual(nfa.closure(1), nfa.start_mask)
+        # 推进后到达接受状态
+        self.assertTrue(nfa.advance(nfa.start_mask, "b", "b") & nfa.accept_mask)
+        self.assertEqual(nfa.advance(nfa.start_mask, "c", "c"), 0)
+        # 按标签汇总的转换表
+        b_id = nfa.literal_label_ids["b"]
+        self.assertEqual(bin(nfa.step_masks[b_id]).count("1"), 1)
+        self.assertEqual(set(nfa.succ_masks[b_id].values()), {nfa.accept_mask})
+
+    def test_first_chars_prefilter(self):
+        """测试首字符预筛"""
+        cases = [
+            ("yinyue", frozenset("y")),
+            ("(yin|bei)jing", frozenset("yb")),
+            ("y.+e", frozenset("y")),
+            (".+e", None),
+            ("^yin", None),
+            ("a*", None),
+        ]
+        for pattern, expected in cases:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(compile_pattern(pattern).first_chars, expected)
+
+        tokens = text_to_tokens("音乐")
+        self.assertTrue(compile_pattern("yinyue").may_match(tokens))
+        self.assertTrue(compile_pattern(".+").may_match(tokens))
+        self.assertFalse(compile_pattern("xyz").may_match(tokens))
+        # 预筛只会提前拒绝，不改变匹配结果
+        for pattern in ["xyz", "le", "yy", "(bei|le)"]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(
+                    pinyin_regex_match(pattern, "音乐"),
+                    run_pinyin_regex(compile_regex(pattern), tokens),
+                )
+
+    def test_head_mask_prefilter(self):
+        """测试首字符位掩码预筛与逐个拼音判断一致"""
+        from pinyin_regex.engine import head_bit, pinyin_head_mask
+
+        self.assertEqual(pinyin_head_mask(frozenset({"yin", "y", "音"})), head_bit("y") | head_bit("音"))
+        self.assertEqual(pinyin_head_mask({"", "a"}), head_bit("a"))
+        self.assertEqual(head_bit("音"), head_bit("乐"))
+
+        arrays = text_to_token_arrays("北京音乐")
+        for pattern in ["yinyue", "bj", "xyz", "音乐", "乐", "[a]", "q"]:
+            nfa = compile_pattern(pattern)
+            expected = nfa.first_chars is None or any(
+                py[:1] in nfa.first_chars for pys in arrays.pinyins for py in pys
+            )
+            with self.subTest(pattern=pattern):
+                self.assertEqual(nfa.may_match(arrays), expected)
+        # 非ASCII首字符共用一位，预筛偏保守但不会误拒
+        self.assertTrue(compile_pattern("龙").may_match(arrays))
+        self.assertFalse(pinyin_regex_match("龙", "北京音乐"))
+
+    def test_skip_tokens_without_first_chars(self):
+        """测试只有起始闭包活跃时跳过不可能开始匹配的token"""
+        nfa = compile_pattern("yinyue")
+        tokens = text_to_token_arrays("北京音乐")
+        self.assertEqual(nfa.advance_token(nfa.start_mask, "北", tokens.pinyins[1]), 0)
+        self.assertNotEqual(nfa.advance_token(nfa.start_mask, "音", tokens.pinyins[3]), 0)
+        for text, expected in [("北京音乐", True), ("北京音", False), ("音北乐", False)]:
+            with self.subTest(text=text):
+                self.assertEqual(run_pinyin_regex(nfa, text_to_token_arrays(text)), expected)
+
+    def test_anchored_early_exit(self):
+        """测试锚定模式不再重新加入起始闭包，活跃状态为空时提前结束"""
+        for pattern, expected in [("^yin", True), ("^(yin|bei)", True), ("yin", False), ("^a*", True), ("a^", False), ("a*", False)]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(compile_pattern(pattern).anchored, expected)
+
+        test_cases = [
+            ("^yin", "音乐", True),
+            ("^yin", "乐音", False),
+            ("^(yin|bei)jing", "北京", True),
+            ("^yue", "音乐", False),
+            ("^yin$", "音", True),
+            ("^yin$", "音乐", False),
+            ("^$", "", True),
+        ]
+        for pattern, text, expected in test_cases:
+            with self.subTest(pattern=pattern, text=text):
+                self.assertEqual(run_pinyin_regex(compile_pattern(pattern), text_to_tokens(text)), expected)
+
+    def test_tokens_consumed_lazily(self):
+        """测试接受或活跃状态为空后不再读取后续token"""
+
+        def guarded(text, limit):
+            for i, token in enumerate(text_to_tokens(text)):
+                if i >= limit:
+                    raise AssertionError(f"读取了第 {i} 个token")
+                yield token
+
+        for compile_fn in (compile_pattern, compile_regex_dfa):
+            with self.subTest(compile_fn=compile_fn.__name__):
+                # 在第3个token（乐）处接受
+                engine = compile_fn("yinyue")
+                self.assertTrue(run_pinyin_regex(engine, guarded("音乐" + "北京" * 10, 3)))
+                # 锚定模式读完 <BOS> 和“北”之后没有活跃状态
+                engine = compile_fn("^yin")
+                self.assertFalse(run_pinyin_regex(engine, guarded("北京" * 10, 2)))
+
+    def test_label_interning(self):
+        """测试标签驻留为整数编号"""
+        nfa = compile_pattern(r"y[a-z]+e.\d")
+        # 重复出现的标签只保存一次
+        self.assertEqual(len(nfa.labels), len(set(map(repr, nfa.labels))))
+        self.assertEqual(nfa.labels[nfa.literal_label_ids["y"]], "y")
+        self.assertEqual(nfa.labels[nfa.literal_label_ids["e"]], "e")
+        special = {repr(nfa.labels[i]) for i in nfa.special_label_ids}
+        self.assertIn(repr("."), special)
+        self.assertIn(repr(r"\d"), special)
+        # y 同时匹配字面量 y、字符类 [a-z] 和通配符 .
+        class_id = next(i for i, label in enumerate(nfa.labels) if isinstance(label, frozenset))
+        dot_id = nfa.labels.index(".")
+        self.assertEqual(
+            nfa.matching_labels("音", "y"), {nfa.literal_label_ids["y"], class_id, dot_id}
+        )
+
+    def test_live_mask(self):
+        """测试无法到达接受状态的状态被排除在 live_mask 之外"""
+        start, accept, dead = State(), State(), State()
+        accept.accept = True
+        start.trans["a"] = {accept}
+        start.trans["b"] = {dead}
+        finalize_nfa(start)
+        nfa = CompiledNFA(start)
+        self.assertEqual(nfa.live_mask, nfa.start_mask | nfa.accept_mask)
+        self.assertTrue(run_pinyin_regex(nfa, text_to_tokens("ba")))
+        self.assertFalse(run_pinyin_regex(nfa, text_to_tokens("bb")))
+        # 正常编译的模式所有状态都能到达接受状态
+        nfa = compile_pattern("yin(yue|le)+")
+        self.assertEqual(nfa.live_mask, (1 << nfa.n_states) - 1)
+
+    def test_ascii_label_table(self):
+        """测试ASCII字符的预计算标签与逐个调用匹配函数一致"""
+        nfa = compile_pattern(r"[a-m]x[^aeiou]\d.y(<BOS>|\w)")
+        for ch_org in ["音", "1", "a", "<BOS>"]:
+            for ch in ["a", "n", "x", "y", "1", " ", "-", "<BOS>", "音"]:
+                expected = {
+                    label_id
+                    for label_id, label in enumerate(nfa.labels)
+                    if match_label(label, ch_org, ch)
+                }
+                with self.subTest(ch_org=ch_org, ch=ch):
+                    self.assertEqual(set(nfa.matching_labels(ch_org, ch)), expected)
+
+    def test_run_with_state_or_compiled(self):
+        """测试 run_pinyin_regex 接受 State 和 CompiledNFA"""
+        test_cases = [
+            ("yinyue", "音乐", True),
+            ("yin(yue|le){2}", "音乐", False),
+            ("^yin$", "音", True),
+        ]
+
+        for pattern, text, expected in test_cases:
+            with self.subTest(pattern=pattern, text=text):
+                tokens = text_to_tokens(text)
+                start_state = compile_regex(pattern)
+                self.assertEqual(run_pinyin_regex(start_state, tokens), expected)
+                self.assertEqual(run_pinyin_regex(CompiledNFA(start_state), tokens), expected)
+
+    def test_anchored_alternation(self):
+        """测试多个分支同时含边界符号"""
+        test_cases = [
+            ("(^yin|^bei)", "音乐", True),
+            ("(^yin|^bei)", "北京", True),
+            ("(^yin|^bei)", "上海", False),
+            ("(yue$|jing$)", "音乐", True),
+            ("(yue$|jing$)", "北京", True),
+            ("(yue$|jing$)", "上海", False),
+        ]
+
+        for pattern, text, expected in test_cases:
+            with self.subTest(pattern=pattern, text=text):
+                self.assertEqual(pinyin_regex_match(pattern, text), expected)
+
+
+class TestLazyDFA(unittest.TestCase):
+    """惰性DFA测试"""
+
+    def test_compile_regex_dfa(self):
+        """测试各种模式都能编译为DFA"""
+        for pattern in ["yin(yue|le)+", "y.+e", "[yl]in", r"\z", "^yin", "yin$"]:
+            with self.subTest(pattern=pattern):
+                dfa = compile_regex_dfa(pattern)
+                self.assertIsInstance(dfa, LazyDFA)
+        self.assertFalse(compile_regex_dfa("yin[a-z]").uses_char_properties)
+        self.assertTrue(compile_regex_dfa(r"y\w").uses_char_properties)
+
+    def test_dfa_matches_nfa(self):
+        """测试DFA与NFA匹配结果一致"""
+        patterns = [
+            "yinyue", "yy", "yin(yue|le)", "(yin|bei)+jing", "y{1,2}", "zong", "a*", "xyz",
+            "y.+e", "[yl]in", "[^z]hong", r"\z\z", r"\d+", r"y\w+e", r"\s", "^yin", "yue$", "^$",
+            "(^yin|^bei)", "x[^a]",
+        ]
+        texts = ["音乐", "背景音乐", "北京", "中国", "", "因音乐", "abc", "a1 b2", "x"]
+        for pattern in patterns:
+            dfa = compile_regex_dfa(pattern)
+            nfa = compile_pattern(pattern)
+            for text in texts:
+                with self.subTest(pattern=pattern, text=text):
+                    tokens = text_to_tokens(text)
+                    self.assertEqual(run_pinyin_regex(dfa, tokens), run_pinyin_regex(nfa, tokens))
+
+    def test_specialized_match(self):
+        """测试特化的匹配函数与NFA结果一致"""
+        patterns = ["yinyue", "yy", "(yin|bei)+jing", "y.+e", r"y\w+e", r"\d+", "^yin", "yue$", "^$"]
+        texts = ["音乐", "背景音乐", "北京", "", "abc", "a1 b2"]
+        for pattern in patterns:
+            dfa = compile_regex_dfa(pattern)
+            nfa = compile_pattern(pattern)
+            for text in texts:
+                with self.subTest(pattern=pattern, text=text):
+                    tokens = text_to_token_arrays(text)
+                    self.assertEqual(dfa.match(tokens), run_pinyin_regex(nfa, tokens))
+
+    def test_transition_memo(self):
+        """测试转换在首次遇到后被缓存"""
+        dfa = compile_regex_dfa("yinyue")
+        tokens = text_to_tokens("音乐")
+        self.assertTrue(run_pinyin_regex(dfa, tokens))
+        n_trans = dfa.n_trans
+        self.assertGreater(n_trans, 0)
+        self.assertTrue(run_pinyin_regex(dfa, tokens))
+        self.assertEqual(dfa.n_trans, n_trans)
+
+    def test_transition_cache_limit(self):
+        """测试转换缓存达到上限后清空并继续正确匹配"""
+        from pinyin_regex import engine
+
+        pattern = "(a|b)*a(a|b)"
+        text = "abbabaababbbaabab"
+        expected = pinyin_regex_match(pattern, text)
+        original = engine.DFA_CACHE_SIZE
+        engine.DFA_CACHE_SIZE = 4
+        try:
+            dfa = compile_regex_dfa(pattern)
+            self.assertEqual(run_pinyin_regex(dfa, text_to_tokens(text)), expected)
+            self.assertLessEqual(dfa.n_trans, 4)
+            self.assertFalse(dfa.fallback)
+        finally:
+            engine.DFA_CACHE_SIZE = original
+
+    def test_shared_across_threads(self):
+        """测试多个线程共享同一DFA并频繁清空缓存时结果仍正确"""
+        import threading
+
+        from pinyin_regex import engine
+
+        pattern = r"(yin|bei)+\w*"
+        texts = ["音乐北京", "背景音乐", "abc", "北京音乐a1", "舞蹈"]
+        expected = [run_pinyin_regex(compile_pattern(pattern), text_to_token_arrays(t)) for t in texts]
+        original = engine.DFA_CACHE_SIZE
+        engine.DFA_CACHE_SIZE = 4
+        try:
+            dfa = compile_regex_dfa(pattern)
+            results = []
+
+            def worker():
+                for _ in range(50):
+                    results.append([run_pinyin_regex(dfa, text_to_token_arrays(t)) for t in texts])
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            engine.DFA_CACHE_SIZE = original
+        self.assertEqual(len(results), 200)
+        self.assertTrue(all(r == expected for r in results))
+
+    def test_char_signature_cache(self):
+        """测试缓存的属性签名与逐项计算一致"""
+        from pinyin_regex.engine import _compute_signature
+
+        for ch in ["<BOS>", "1", "a", "Z", " ", "\t", "é", "音", "١", "\u3000", "ab", "，"]:
+            with self.subTest(ch=ch):
+                self.assertEqual(char_signature(ch), _compute_signature(ch))
+                self.assertEqual(char_signature(ch), _compute_signature(ch))
+
+    def test_token_transition_memo(self):
+        """测试整个token的转换按拼音集合缓存，且与NFA结果一致"""
+        dfa = compile_regex_dfa("yinyue")
+        tokens = text_to_token_arrays("背景音乐很好听")
+        self.assertTrue(run_pinyin_regex(dfa, tokens))
+        self.assertIn(tokens.pinyins[3], dfa.token_trans)
+
+        nfa = compile_pattern("yinyue")
+        for py_set in tokens.pinyins[1:-1]:
+            with self.subTest(pinyins=sorted(py_set)):
+                self.assertEqual(
+                    dfa.advance_token(dfa.start_mask, "x", py_set),
+                    nfa.advance_token(nfa.start_mask, "x", py_set),
+                )
+
+        # 可变集合不能作为缓存键，逐个拼音推进
+        tokens = [
+            {"char": "<BOS>", "pinyins": {"<BOS>"}},
+            {"char": "音", "pinyins": {"yin", "y"}},
+            {"char": "乐", "pinyins": {"yue", "le"}},
+            {"char": "<EOS>", "pinyins": {"<EOS>"}},
+        ]
+        self.assertTrue(run_pinyin_regex(compile_regex_dfa("yinyue"), tokens))
+
+    def test_literal_union_scan(self):
+        """测试字面量选择模式在长文本上的子串搜索"""
+        pattern = "(beijing|shanghai|yinyue)"
+        dfa = compile_regex_dfa(pattern)
+        filler = "我爱天安门" * 50
+        for text, expected in [
+            (filler, False),
+            (filler + "北京", True),
+            ("上海" + filler, True),
+            (filler + "音" + filler + "乐", False),
+            (filler + "北平", False),
+        ]:
+            with self.subTest(text=text[-4:]):
+                tokens = text_to_token_arrays(text)
+                self.assertEqual(run_pinyin_regex(dfa, tokens), expected)
+                self.assertEqual(run_pinyin_regex(compile_pattern(pattern), tokens), expected)
+        self.assertFalse(dfa.fallback)
+
+    def test_char_signature(self):
+        """测试原始字符属性签名区分 \\d、\\w、\\s、\\z 和边界"""
+        chars = ["<BOS>", "<EOS>", "1", "a", " ", "音", "，"]
+        sigs = [char_signature(c) for c in chars]
+        self.assertEqual(sigs[0], sigs[1])
+        self.assertEqual(len(set(sigs[1:])), len(chars) - 1)
+
+    def test_state_blowup_fallback(self):
+        """测试DFA状态数超限后退回NFA模拟"""
+        from pinyin_regex import engine
+
+        dfa = compile_regex_dfa("(a|b)*a(a|b)(a|b)(a|b)")
+        text = "abbabaababbbaabab"
+        expected = pinyin_regex_match("(a|b)*a(a|b)(a|b)(a|b)", text)
+        original = engine.DFA_STATE_LIMIT
+        engine.DFA_STATE_LIMIT = 3
+        try:
+            self.assertEqual(run_pinyin_regex(dfa, text_to_tokens(text)), expected)
+            self.assertTrue(dfa.fallback)
+            self.assertEqual(dfa.trans, {})
+            self.assertEqual(dfa.n_trans, 0)
+            self.assertEqual(run_pinyin_regex(dfa, text_to_tokens(text)), expected)
+        finally:
+            engine.DFA_STATE_LIMIT = original
+
+
+class TestCache(unittest.TestCase):
+    """缓存功能测试"""
+
+    def setUp(self):
+        clear_cache()
+
+    def test_compile_cache_reuse(self):
+        """测试重复匹配复用已编译的NFA"""
+        self.assertTrue(pinyin_regex_match("yinyue", "音乐"))
+        self.assertTrue(pinyin_regex_match("YinYue", "音乐"))
+        info = _compile_cached.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 1)
+
+    def test_compile_once_per_pattern(self):
+        """测试同一模式在多组用例间只编译一次"""
+        test_cases = [
+            ("chongqing", "重庆", True),
+            ("chongqing", "重庆市", True),
+            ("chongqing", "北京", False),
+            ("yin(yue|le)", "音乐", True),
+            ("yin(yue|le)", "音乐家", True),
+        ]
+
+        for pattern, text, expected in test_cases:
+            with self.subTest(pattern=pattern, text=text):
+                self.assertEqual(pinyin_regex_match(pattern, text), expected)
+        info = _compile_cached.cache_info()
+        self.assertEqual(info.misses, len({pattern for pattern, _, _ in test_cases}))
+        self.assertEqual(info.hits, len(test_cases) - info.misses)
+
+    def test_cached_nfa_not_mutated(self):
+        """测试缓存的NFA在多次匹配后结果保持一致"""
+        test_cases = [
+            ("yin(yue|le)+", "音乐乐", True),
+            ("yin(yue|le)+", "北京", False),
+            ("yin(yue|le)+", "音乐", True),
+        ]
+
+        for pattern, text, expected in test_cases * 2:
+            with self.subTest(pattern=pattern, text=text):
+                self.assertEqual(pinyin_regex_match(pattern, text), expected)
+
+    def test_tokens_cache_reuse(self):
+        """测试相同文本和选项复用token结果"""
+        pinyin_regex_match("yinyue", "音乐")
+        pinyin_regex_match("yy", "音乐")
+        pinyin_regex_match("yy", "音乐", use_initials=False)
+        pinyin_regex_match("yinyue", "音乐", use_initials=False)
+        info = _tokens_default.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 1)
+        info = _tokens_cached.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 1)
+        self.assertFalse(pinyin_regex_match("yy", "音乐", use_initials=False))
+
+    def test_clear_cache(self):
+        """测试清空缓存"""
+        pinyin_regex_match("yinyue", "音乐")
+        clear_cache()
+        self.assertEqual(_compile_cached.cache_info().currsize, 0)
+        self.assertEqual(_tokens_cached.cache_info().currsize, 0)
+        self.assertEqual(_tokens_default.cache_info().currsize, 0)
 
 
 class TestComplexCombination(unittest.TestCase):